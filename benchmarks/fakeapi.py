@@ -0,0 +1,251 @@
+"""Offline stand-in for the Hypixel, Mojang and stem APIs.
+
+Point the constants at FakeAPI.url to exercise modules/ without the internet:
+    constants.HYPIXEL_API_URL = server.url + "/hypixel/v2"
+    constants.MOJANG_API_URL = server.url + "/mojang/{}"
+    constants.MOJANG_BULK_API_URL = server.url + "/mojang/bulk"
+    constants.IGN_STEM_URL = server.url + "/stem/{}"
+(FakeAPI.patch_constants() does exactly that.)
+"""
+
+from typing import Any
+from urllib.parse import parse_qs, unquote, urlsplit
+import asyncio
+import bisect
+import json
+import random
+import time
+
+import constants
+
+
+DISCONNECT_ERRORS = (ConnectionError, asyncio.IncompleteReadError, ValueError)
+PLAYER_COOLDOWN_CAUSE = (
+    "You have already looked up this player too recently, please try again shortly"
+)
+
+
+class FakePlayer:
+    def __init__(self, index: int):
+        self.uuid = f"{index:032x}"
+        self.name = f"Player{index}"
+        self.rank = "YOUTUBER" if index % 50 == 0 else None
+        self.discord = f"player{index}"
+
+    def hypixel(self) -> dict[str, Any]:
+        player: dict[str, Any] = {
+            "uuid": self.uuid,
+            "displayname": self.name,
+            "socialMedia": {"links": {"DISCORD": self.discord}},
+        }
+        if self.rank:
+            player["rank"] = self.rank
+        return player
+
+
+class FakeAPI:
+    def __init__(
+        self,
+        players: int = 10_000,
+        latency: float = 0.02,
+        jitter: float = 0.01,
+        error_rate: float = 0.0,
+        rate_limit: int = 0,
+        rate_limit_window: int = 300,
+        player_cooldown: float = 0.0,
+        stem_limit: int | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        # rate_limit=0 still sends RateLimit-* headers, it just never runs out
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.player_cooldown = player_cooldown
+        # defaults to the cap the real stem api is assumed to have
+        self.stem_limit = stem_limit or constants.IGN_STEM_LIMIT
+        self.host = host
+        self.port = port
+        self.players = [FakePlayer(i) for i in range(players)]
+        self.by_uuid = {player.uuid: player for player in self.players}
+        self.by_name = {player.name.lower(): player for player in self.players}
+        self.sorted_names = sorted(self.by_name)
+        self.requests: dict[str, int] = {}
+        self._window_start = time.monotonic()
+        self._window_used = 0
+        self._player_lookups: dict[str, float] = {}
+        self._server: asyncio.Server | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def patch_constants(self):
+        constants.HYPIXEL_API_URL = self.url + "/hypixel/v2"
+        constants.MOJANG_API_URL = self.url + "/mojang/{}"
+        constants.MOJANG_BULK_API_URL = self.url + "/mojang/bulk"
+        constants.IGN_STEM_URL = self.url + "/stem/{}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeAPI":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode().split(" ", 2)
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    key, _, value = line.decode().partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                await asyncio.sleep(
+                    max(self.latency + random.uniform(-self.jitter, self.jitter), 0)
+                )
+                status, data, extra_headers = self.route(method, target, body)
+                payload = json.dumps(data).encode()
+                response_headers = {
+                    "Content-Type": "application/json",
+                    "Content-Length": str(len(payload)),
+                    **extra_headers,
+                }
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\n".encode()
+                    + "".join(
+                        f"{k}: {v}\r\n" for k, v in response_headers.items()
+                    ).encode()
+                    + b"\r\n"
+                    + (payload if method != "HEAD" else b"")
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except DISCONNECT_ERRORS:
+            pass
+        finally:
+            writer.close()
+
+    def route(
+        self, method: str, target: str, body: bytes
+    ) -> tuple[int, Any, dict[str, str]]:
+        url = urlsplit(target)
+        path = unquote(url.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        service = path.strip("/").split("/", 1)[0]
+        self.requests[service] = self.requests.get(service, 0) + 1
+        if method == "HEAD" or service not in ("hypixel", "mojang", "stem"):
+            return 200, {}, {}
+        if self.error_rate and random.random() < self.error_rate:
+            return 500, {"success": False, "cause": "Internal error"}, {}
+        if service == "hypixel":
+            return self.hypixel(path.removeprefix("/hypixel/v2"), query)
+        if service == "mojang":
+            if method == "POST":
+                return self.mojang_bulk(json.loads(body or b"[]"))
+            return self.mojang(path.removeprefix("/mojang/"))
+        return self.stem(path.removeprefix("/stem/"))
+
+    def _rate_limit_headers(self) -> tuple[bool, dict[str, str]]:
+        now = time.monotonic()
+        if now - self._window_start >= self.rate_limit_window:
+            self._window_start = now
+            self._window_used = 0
+        limit = self.rate_limit or 1_000_000
+        reset = max(int(self._window_start + self.rate_limit_window - now), 1)
+        allowed = self._window_used < limit
+        if allowed:
+            self._window_used += 1
+        headers = {
+            "RateLimit-Limit": str(limit),
+            "RateLimit-Remaining": str(max(limit - self._window_used, 0)),
+            "RateLimit-Reset": str(reset),
+        }
+        if not allowed:
+            headers["Retry-After"] = str(reset)
+        return allowed, headers
+
+    def hypixel(
+        self, endpoint: str, query: dict[str, str]
+    ) -> tuple[int, Any, dict[str, str]]:
+        if not query.get("key"):
+            return 403, {"success": False, "cause": "Invalid API key"}, {}
+        allowed, headers = self._rate_limit_headers()
+        if not allowed:
+            return 429, {"success": False, "cause": "Key throttle"}, headers
+        if endpoint != "/player":
+            return 404, {"success": False, "cause": "Unknown endpoint"}, headers
+        uuid = query.get("uuid", "").replace("-", "")
+        if not uuid:
+            return (
+                400,
+                {"success": False, "cause": "Missing one or more fields"},
+                headers,
+            )
+        if self.player_cooldown:
+            now = time.monotonic()
+            last = self._player_lookups.get(uuid)
+            if last is not None and now - last < self.player_cooldown:
+                headers["Retry-After"] = str(
+                    int(self.player_cooldown - (now - last)) + 1
+                )
+                return 429, {"success": False, "cause": PLAYER_COOLDOWN_CAUSE}, headers
+            self._player_lookups[uuid] = now
+        player = self.by_uuid.get(uuid)
+        return (
+            200,
+            {"success": True, "player": player.hypixel() if player else None},
+            headers,
+        )
+
+    def _lookup(self, identifier: str) -> FakePlayer | None:
+        identifier = identifier.lower().replace("-", "")
+        return self.by_uuid.get(identifier) or self.by_name.get(identifier)
+
+    def mojang(self, identifier: str) -> tuple[int, Any, dict[str, str]]:
+        player = self._lookup(identifier)
+        if player is None:
+            return (
+                404,
+                {"errorMessage": f"Couldn't find any profile with name {identifier}"},
+                {},
+            )
+        return 200, {"id": player.uuid, "name": player.name}, {}
+
+    def mojang_bulk(self, names: list[str]) -> tuple[int, Any, dict[str, str]]:
+        if len(names) > 10:
+            return 400, {"errorMessage": "Not more that 10 profile name per call"}, {}
+        found = [self.by_name.get(name.lower()) for name in names]
+        return (
+            200,
+            [{"id": player.uuid, "name": player.name} for player in found if player],
+            {},
+        )
+
+    def stem(self, stem: str) -> tuple[int, Any, dict[str, str]]:
+        stem = stem.lower()
+        players: list[dict[str, str]] = []
+        for name in self.sorted_names[bisect.bisect_left(self.sorted_names, stem) :]:
+            if not name.startswith(stem) or len(players) >= self.stem_limit:
+                break
+            player = self.by_name[name]
+            players.append({"uuid": player.uuid, "name": player.name})
+        return 200, players, {}
@@ -0,0 +1,136 @@
+"""Throughput benchmark for modules/ against benchmarks.fakeapi.
+
+Usage: python -m benchmarks.run [--requests 2000] [--concurrency 50] [--latency 0.02]
+"""
+
+from typing import Any, Awaitable, Callable
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+
+from benchmarks.fakeapi import FakeAPI
+from modules import asyncreqs, hypixel, mojang, ragingenbyapi
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def bench(
+    name: str,
+    func: Callable[[Any], Awaitable[Any]],
+    inputs: list[Any],
+    concurrency: int,
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    errors = 0
+    jobs = iter(inputs)
+
+    async def worker():
+        nonlocal errors
+        for arg in jobs:
+            start = time.perf_counter()
+            try:
+                result = await func(arg)
+            except Exception:
+                errors += 1
+            else:
+                # batch calls like mojang.get_players return failures in place
+                if isinstance(result, list):
+                    errors += sum(isinstance(item, Exception) for item in result)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "calls": len(inputs),
+        "errors": errors,
+        "rps": len(inputs) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def print_results(results: list[dict[str, Any]]):
+    print(
+        f"{'function':<32}{'calls':>8}{'errors':>8}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}"
+    )
+    for r in results:
+        print(
+            f"{r['name']:<32}{r['calls']:>8}{r['errors']:>8}{r['rps']:>10.1f}"
+            f"{r['p50']:>10.1f}{r['p99']:>10.1f}{r['mean']:>10.1f}"
+        )
+
+
+async def main(args: argparse.Namespace):
+    async with FakeAPI(
+        players=args.players,
+        latency=args.latency,
+        jitter=args.latency / 2,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        player_cooldown=args.player_cooldown,
+    ) as server:
+        server.patch_constants()
+        # every benchmark gets its own slice of players so earlier runs don't warm the caches
+        players = iter(server.players)
+        n = args.requests
+        results = [
+            await bench(
+                "mojang.get_player",
+                mojang.get_player,
+                [p.name for p in itertools.islice(players, n)],
+                args.concurrency,
+            ),
+            await bench(
+                "mojang.get_players (x100)",
+                lambda batch: mojang.get_players(*batch),
+                list(
+                    itertools.batched(
+                        (p.name for p in itertools.islice(players, n)), 100
+                    )
+                ),
+                max(args.concurrency // 10, 1),
+            ),
+            await bench(
+                "hypixel.get_player",
+                hypixel.get_player,
+                [
+                    mojang.Player(uuid=p.uuid, name=p.name)
+                    for p in itertools.islice(players, n)
+                ],
+                args.concurrency,
+            ),
+            await bench(
+                "ragingenbyapi.search_ign_stem",
+                ragingenbyapi.search_ign_stem,
+                [p.name.lower() for p in itertools.islice(players, n)],
+                args.concurrency,
+            ),
+        ]
+        await asyncreqs.close()
+    print_results(results)
+    print("server requests:", server.requests)
+    print("hypixel:", hypixel.stats())
+    print("mojang:", mojang.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--players", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--player-cooldown", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
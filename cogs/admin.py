@@ -45,7 +45,7 @@ class AdminCog(commands.Cog):
             description="The Minecraft username or UUID to link the member to.",
             min_length=1,
             max_length=32,
-            autocomplete=autocomplete.ign,
+            autocomplete=autocomplete.verify_ign,
         ),
         member: disnake.Member = commands.Param(
             description="The member to verify the Minecraft account to",
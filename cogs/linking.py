@@ -1,5 +1,6 @@
 import asyncio
 import datetime
+import time
 from typing import Literal, NotRequired, TypedDict
 from disnake.ext import commands
 import disnake
@@ -9,7 +10,7 @@ from pymongo.results import DeleteResult
 
 if TYPE_CHECKING:
     from cogs import UtilsCog
-from modules import hypixel, autocomplete, mongodb, mojang
+from modules import hypixel, autocomplete, mongodb, mojang, sync
 import constants
 
 LinkSource = Literal["hypixel", "manual"]
@@ -24,11 +25,183 @@ class LinkedUserDoc(TypedDict):
     betaTester: NotRequired[bool]
 
 
+class Fingerprint:
+    # what the last sync applied to a member and when hypixel was last checked for it
+    __slots__ = ("uuid", "name", "rank", "roles", "checked_at")
+
+    def __init__(self, uuid: str, name: str, rank: str | None, roles: frozenset[int]):
+        self.uuid = uuid
+        self.name = name
+        self.rank = rank
+        self.roles = roles
+        self.checked_at = time.monotonic()
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() - self.checked_at < constants.SYNC_FRESH_FOR
+
+    def applied_to(self, member: disnake.Member) -> bool:
+        return member.display_name == self.name and all(
+            member.get_role(role_id) for role_id in self.roles
+        )
+
+
+class MemberEdit:
+    # collects role and nick changes so they go out as one member PATCH, add_roles and
+    # remove_roles otherwise send a request per role and the nick needs one more
+    def __init__(self, member: disnake.Member):
+        self.member = member
+        self.roles: dict[int, disnake.abc.Snowflake] = {
+            role.id: role
+            for role in member.roles[1:]  # skip @everyone
+        }
+        self.nick = member.nick
+        self.roles_changed = False
+        self.nick_changed = False
+
+    @property
+    def changed(self) -> bool:
+        return self.roles_changed or self.nick_changed
+
+    def add_roles(self, *roles: disnake.abc.Snowflake):
+        for role in roles:
+            if role.id not in self.roles:
+                self.roles[role.id] = role
+                self.roles_changed = True
+
+    def remove_roles(self, *roles: disnake.abc.Snowflake):
+        for role in roles:
+            if self.roles.pop(role.id, None) is not None:
+                self.roles_changed = True
+
+    def set_nick(self, nick: str | None):
+        if nick != self.nick:
+            self.nick = nick
+            self.nick_changed = True
+
+    async def apply(self, reason: str | None = None) -> bool:
+        if not self.changed:
+            return False
+        kwargs: dict[str, Any] = {}
+        if self.roles_changed:
+            kwargs["roles"] = list(self.roles.values())
+        if self.nick_changed:
+            kwargs["nick"] = self.nick
+        await self.member.edit(**kwargs, reason=reason)
+        return True
+
+
+class LinkIndex:
+    # in-memory mirror of linked_members, mongo stays the source of truth and every write
+    # goes there first
+    def __init__(self, collection: mongodb.Collection):
+        self.collection = collection
+        self.by_discord: dict[int, LinkedUserDoc] = {}
+        self.by_uuid: dict[str, LinkedUserDoc] = {}
+        self.loaded = asyncio.Event()
+        self._journal: list[tuple[LinkedUserDoc | None, list[LinkedUserDoc]]] | None = (
+            None
+        )
+
+    def __len__(self) -> int:
+        return len(self.by_discord)
+
+    def find(
+        self, discord_id: int | None = None, uuid: str | None = None
+    ) -> list[LinkedUserDoc]:
+        docs = [
+            self.by_discord.get(discord_id) if discord_id is not None else None,
+            self.by_uuid.get(uuid) if uuid is not None else None,
+        ]
+        return list({doc["_id"]: doc for doc in docs if doc is not None}.values())
+
+    def set(self, doc: LinkedUserDoc):
+        if self._journal is not None:
+            self._journal.append((doc, []))
+        self._set(self.by_discord, self.by_uuid, doc)
+
+    def remove(self, *docs: LinkedUserDoc):
+        if self._journal is not None:
+            self._journal.append((None, list(docs)))
+        self._remove(self.by_discord, self.by_uuid, *docs)
+
+    @staticmethod
+    def _set(
+        by_discord: dict[int, LinkedUserDoc],
+        by_uuid: dict[str, LinkedUserDoc],
+        doc: LinkedUserDoc,
+    ):
+        old = by_discord.get(doc["_id"])
+        if old is not None and by_uuid.get(old["uuid"]) is old:
+            del by_uuid[old["uuid"]]
+        by_discord[doc["_id"]] = doc
+        by_uuid[doc["uuid"]] = doc
+
+    @staticmethod
+    def _remove(
+        by_discord: dict[int, LinkedUserDoc],
+        by_uuid: dict[str, LinkedUserDoc],
+        *docs: LinkedUserDoc,
+    ):
+        for doc in docs:
+            if by_discord.get(doc["_id"]) is doc:
+                del by_discord[doc["_id"]]
+            if by_uuid.get(doc["uuid"]) is doc:
+                del by_uuid[doc["uuid"]]
+
+    async def resync(self, apply: bool = True) -> dict[str, int]:
+        # returns how far the index had drifted from mongo, apply=False only checks
+        self._journal = []
+        try:
+            by_discord: dict[int, LinkedUserDoc] = {}
+            by_uuid: dict[str, LinkedUserDoc] = {}
+            async for doc in self.collection.iterate({}):
+                self._set(by_discord, by_uuid, cast("LinkedUserDoc", doc))
+            drift = {"missing": 0, "stale": 0, "changed": 0}
+            if self.loaded.is_set():
+                for discord_id, doc in by_discord.items():
+                    current = self.by_discord.get(discord_id)
+                    if current is None:
+                        drift["missing"] += 1
+                    elif current["uuid"] != doc["uuid"]:
+                        drift["changed"] += 1
+                drift["stale"] = len(self.by_discord.keys() - by_discord.keys())
+            if apply:
+                # replay writes that landed while the cursor was being read
+                for doc, removed in self._journal:
+                    if doc is not None:
+                        self._set(by_discord, by_uuid, doc)
+                    self._remove(
+                        by_discord,
+                        by_uuid,
+                        *[
+                            by_discord[d["_id"]]
+                            for d in removed
+                            if d["_id"] in by_discord
+                        ],
+                    )
+                self.by_discord, self.by_uuid = by_discord, by_uuid
+                self.loaded.set()
+            return drift
+        finally:
+            self._journal = None
+
+
 class LinkingCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.task: asyncio.Task | None = None
+        self.index_task: asyncio.Task | None = None
+        # discord's own rate limits are paced by disnake's http client, hypixel's by the
+        # governor in modules/hypixel, so the workers don't need any fixed sleeps
+        self.sync = sync.SyncEngine(
+            self.sync_member,
+            workers=constants.SYNC_WORKERS,
+            intake_size=constants.SYNC_INTAKE_SIZE,
+        )
         self.linked_users_db = mongodb.Collection(constants.LINKED_COLLECTION_NAME)
+        self.links = LinkIndex(self.linked_users_db)
+        self.fingerprints: dict[int, Fingerprint] = {}
 
     @property
     def UtilsCog(self) -> "UtilsCog":
@@ -95,7 +268,16 @@ class LinkingCog(commands.Cog):
         }
         if manual_reason is not None:
             data["manualReason"] = manual_reason
+        old = self.links.by_discord.get(discord_id)
         await self.linked_users_db.update(data, upsert=True)  # type: ignore
+        self.links.set(data)
+        if old is not None and old["uuid"] != uuid:
+            autocomplete.linked_players.remove(old["uuid"])
+        try:
+            autocomplete.linked_players.add(await mojang.get_player(uuid))
+        except Exception as e:
+            # the link itself is saved, a missing autocomplete entry isn't worth failing over
+            print(f"Failed to index linked player {uuid}: {e}")
 
     def make_verification_query(
         self, discord_id: int | None = None, uuid: str | None = None
@@ -113,15 +295,55 @@ class LinkingCog(commands.Cog):
         self, discord_id: int | None = None, uuid: str | None = None
     ) -> LinkedUserDoc | None:
         query = self.make_verification_query(discord_id, uuid)
+        if self.links.loaded.is_set():
+            docs = self.links.find(discord_id, uuid)
+            return docs[0] if docs else None
         return await self.linked_users_db.get(query)  # type: ignore
 
+    async def search_verifications(
+        self, discord_ids: list[int]
+    ) -> dict[int, LinkedUserDoc]:
+        if self.links.loaded.is_set():
+            return {
+                discord_id: self.links.by_discord[discord_id]
+                for discord_id in discord_ids
+                if discord_id in self.links.by_discord
+            }
+        docs = await self.linked_users_db.get_many(
+            {"_id": {"$in": discord_ids}}, projection={"uuid": 1}
+        )
+        return {doc["_id"]: cast("LinkedUserDoc", doc) for doc in docs}
+
     async def delete_verification(
         self, discord_id: int | None = None, uuid: str | None = None
     ) -> DeleteResult:
         query = self.make_verification_query(discord_id, uuid)
+        if self.links.loaded.is_set():
+            docs = self.links.find(discord_id, uuid)
+        else:
+            docs = cast(
+                "list[LinkedUserDoc]",
+                await self.linked_users_db.get_many(query, projection={"uuid": 1}),
+            )
         if query.get("$or"):
-            return await self.linked_users_db.delete_many(query)
-        return await self.linked_users_db.delete_one(query)
+            result = await self.linked_users_db.delete_many(query)
+        else:
+            result = await self.linked_users_db.delete_one(query)
+            docs = docs[: result.deleted_count]
+        self.links.remove(*docs)
+        for doc in docs:
+            autocomplete.linked_players.remove(doc["uuid"])
+        return result
+
+    async def load_linked_players(self):
+        await self.links.loaded.wait()
+        docs = list(self.links.by_discord.values())
+        players = await mojang.get_players(*[doc["uuid"] for doc in docs])
+        autocomplete.linked_players.clear()
+        for player in players:
+            if isinstance(player, mojang.Player):
+                autocomplete.linked_players.add(player)
+        print(f"Indexed {len(autocomplete.linked_players)}/{len(docs)} linked players")
 
     def get_qualifying_roles(self, player: hypixel.PlayerData) -> list[disnake.Object]:
         roles = [disnake.Object(constants.VERIFIED_ROLE_ID)]
@@ -129,54 +351,65 @@ class LinkingCog(commands.Cog):
             roles.append(disnake.Object(constants.RANK_ROLES[player.rank]))
         return roles
 
-    async def unverify_member(self, member: disnake.Member):
-        tasks = []
-        to_remove: list[disnake.Role] = [
-            role for role in member.roles if role.id in constants.VERIFIED_ONLY_ROLES
-        ]
-        if to_remove:
-            tasks.append(member.remove_roles(*to_remove, reason="Unverified"))
-        if member.nick:
-            tasks.append(member.edit(nick=None, reason="Unverified"))
-        if tasks:
-            try:
-                await asyncio.gather(*tasks)
-            except disnake.errors.Forbidden:
-                print(f"Lacking permissions to unverify member: {member.id}")
+    async def unverify_member(self, member: disnake.Member) -> sync.SyncResult:
+        self.fingerprints.pop(member.id, None)
+        edit = MemberEdit(member)
+        edit.remove_roles(
+            *[role for role in member.roles if role.id in constants.VERIFIED_ONLY_ROLES]
+        )
+        edit.set_nick(None)
+        try:
+            changed = await edit.apply(reason="Unverified")
+        except disnake.errors.Forbidden:
+            print(f"Lacking permissions to unverify member: {member.id}")
+            return "checked"
+        return "changed" if changed else "checked"
 
     async def update_member(
         self,
         member: disnake.Member,
         player: mojang.Player | hypixel.PlayerData | None = None,
-    ):
+        wait: bool = False,
+        force: bool = False,
+    ) -> sync.SyncResult:
         if player is None:
             doc = await self.search_verification(discord_id=member.id)
             if doc is None:
                 return await self.unverify_member(member)
+            fingerprint = self.fingerprints.get(member.id)
+            if (
+                not force
+                and fingerprint is not None
+                and fingerprint.uuid == doc["uuid"]
+                and fingerprint.fresh
+                and fingerprint.applied_to(member)
+            ):
+                return "skipped"
             player = await mojang.get_player(doc["uuid"])
         if isinstance(player, mojang.Player):
-            player = await hypixel.get_player(player)
-
-        tasks = []
-        reason = f"Verified to {player.uuid}"
-
-        roles = [
-            role
-            for role in self.get_qualifying_roles(player)
-            if not member.get_role(role.id)
-        ]
-        if roles:
-            tasks.append(member.add_roles(*roles, reason=reason))
+            player = await hypixel.get_player(player, wait=wait)
+
+        qualifying = self.get_qualifying_roles(player)
+        fingerprint = self.fingerprints[member.id] = Fingerprint(
+            uuid=player.uuid,
+            name=player.name,
+            rank=player.rank,
+            roles=frozenset(role.id for role in qualifying),
+        )
+        if fingerprint.applied_to(member):
+            return "checked"
 
+        edit = MemberEdit(member)
+        edit.add_roles(*qualifying)
         if member.display_name != player.name:
-            tasks.append(member.edit(nick=player.name, reason=reason))
+            edit.set_nick(player.name)
 
-        if tasks:
-            try:
-                await asyncio.gather(*tasks)
-            except disnake.errors.Forbidden:
-                return
-                # print(f"Lacking permissions to update member: {member.id}")
+        try:
+            changed = await edit.apply(reason=f"Verified to {player.uuid}")
+        except disnake.errors.Forbidden:
+            return "checked"
+            # print(f"Lacking permissions to update member: {member.id}")
+        return "changed" if changed else "checked"
 
     @commands.slash_command(
         name="verify",
@@ -188,7 +421,7 @@ class LinkingCog(commands.Cog):
         inter: disnake.AppCmdInter,
         ign: str = commands.Param(
             description="Your Minecraft username or UUID",
-            autocomplete=autocomplete.ign,
+            autocomplete=autocomplete.verify_ign,
             min_length=1,
             max_length=32,
         ),
@@ -208,6 +441,7 @@ class LinkingCog(commands.Cog):
             mojang.get_player(identifier),
             inter.response.defer(),
         )
+        autocomplete.claim_prefetch(player)
 
         # make sure they are not already verified or are reverifying the same account
         discord_doc, uuid_doc = await asyncio.gather(
@@ -296,7 +530,7 @@ class LinkingCog(commands.Cog):
         member = member or cast("disnake.Member", inter.author)
         await asyncio.gather(
             inter.response.defer(),
-            self.update_member(member=member),
+            self.sync.enqueue(member.id, urgent=True),
         )
         return await inter.send(
             embed=self.UtilsCog.make_success(
@@ -307,28 +541,56 @@ class LinkingCog(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_join(self, member: disnake.Member):
-        await self.update_member(member=member)
+        self.sync.admit(member.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: disnake.Member):
+        self.sync.discard(member.id)
+        self.fingerprints.pop(member.id, None)
+
+    async def sync_member(self, member_id: int, urgent: bool) -> sync.SyncResult | None:
+        member = self.UtilsCog.chub.get_member(member_id)
+        if member is None or member.bot:
+            return None
+        # urgent syncs fail fast on hypixel budget instead of queueing for it, and always
+        # recheck hypixel since someone explicitly asked for it
+        return await self.update_member(member=member, wait=not urgent, force=urgent)
+
+    def needs_sync(self, member: disnake.Member) -> bool:
+        if member.bot:
+            return False
+        return member.id in self.links.by_discord or any(
+            role.id in constants.VERIFIED_ONLY_ROLES for role in member.roles
+        )
 
     async def main(self):
+        self.sync.start()
         while True:
-            for member in self.UtilsCog.chub.members:
-                if member.bot:
-                    continue
-                try:
-                    await self.update_member(member=member)
-                except Exception as e:
-                    print(f"Error updating member {member.name} ({member.id}): {e}")
-                    continue
-                await asyncio.sleep(20)
+            # one cursor pass per sweep keeps the link index honest
+            drift = await self.links.resync()
+            if any(drift.values()):
+                print(f"[LinkingCog] Link index had drifted from mongo: {drift}")
+            await self.sync.sweep(
+                [
+                    member.id
+                    for member in self.UtilsCog.chub.members
+                    if self.needs_sync(member)
+                ]
+            )
             await asyncio.sleep(60 * 4)
 
     @commands.Cog.listener()
     async def on_ready(self):
         await self.close()
         self.task = asyncio.create_task(self.main())
+        self.index_task = asyncio.create_task(self.load_linked_players())
 
     async def close(self):
         if self.task is not None and not self.task.done():
             self.task.cancel()
             self.task = None
+        if self.index_task is not None and not self.index_task.done():
+            self.index_task.cancel()
+            self.index_task = None
+        await self.sync.stop()
         await self.linked_users_db.close()
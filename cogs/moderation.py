@@ -1,13 +1,17 @@
 import asyncio
 from disnake.ext import commands
 import disnake
-from typing import TYPE_CHECKING, cast, TypedDict
+from typing import TYPE_CHECKING, Any, cast, TypedDict
 import datetime
 import enum
+import re
 
 if TYPE_CHECKING:
     from cogs import UtilsCog, LinkingCog
-from modules import mongodb, mojang
+from pymongo import UpdateOne
+
+from modules import autocomplete, mongodb, mojang
+from modules.cache import TTLCache
 import constants
 
 
@@ -68,6 +72,16 @@ MESSAGE_CLEAN_TIMES: list[disnake.OptionChoice] = [
     disnake.OptionChoice(name="Previous 7 Days", value=60 * 60 * 24 * 7),
 ]
 
+JOIN_WINDOWS: list[disnake.OptionChoice] = [
+    disnake.OptionChoice(name="Last 5 Mins", value=60 * 5),
+    disnake.OptionChoice(name="Last 15 Mins", value=60 * 15),
+    disnake.OptionChoice(name="Last 30 Mins", value=60 * 30),
+    disnake.OptionChoice(name="Last Hour", value=60 * 60),
+    disnake.OptionChoice(name="Last 3 Hours", value=60 * 60 * 3),
+    disnake.OptionChoice(name="Last 6 Hours", value=60 * 60 * 6),
+    disnake.OptionChoice(name="Last 24 Hours", value=60 * 60 * 24),
+]
+
 MUTE_DURATIONS: list[disnake.OptionChoice] = [
     disnake.OptionChoice(name="60 Secs", value=60),
     disnake.OptionChoice(name="5 Mins", value=60 * 5),
@@ -82,11 +96,227 @@ MUTE_DURATIONS: list[disnake.OptionChoice] = [
 ]
 
 
+# how long gateway audit entries stay around, and how long a ban/unban command waits for
+# its entry to arrive before asking discord's rest api instead
+AUDIT_ENTRY_TTL = datetime.timedelta(minutes=1)
+AUDIT_ENTRY_WAIT = 3.0
+
+# discord's bulk ban endpoint takes at most this many users per call
+BULK_BAN_SIZE = 200
+MASS_BAN_LIMIT = 1000
+
+# ban reconciliation writes this many updates per bulk_write and reruns this often
+RECONCILE_BATCH = 1000
+RECONCILE_INTERVAL = datetime.timedelta(hours=12)
+
+HISTORY_PAGE_SIZE = 5
+HISTORY_PROJECTION: dict[str, Any] = {
+    "discordId": 1,
+    "uuid": 1,
+    "date": 1,
+    "bannedBy": 1,
+    "reason": 1,
+    "unban": 1,
+}
+
+
+def as_utc(date: datetime.datetime) -> datetime.datetime:
+    # mongo hands back naive datetimes that are really utc
+    return date if date.tzinfo else date.replace(tzinfo=datetime.timezone.utc)
+
+
+_last_ban_id = 0
+
+
+def new_ban_id(date: datetime.datetime) -> int:
+    # _id for a ban we record without an audit log entry. snowflake shaped so it sorts
+    # next to real audit entry ids, and strictly increasing so two batches stamped with
+    # the same millisecond can't collide
+    global _last_ban_id
+    _last_ban_id = max(disnake.utils.time_snowflake(date), _last_ban_id + 1)
+    return _last_ban_id
+
+
+AuditKey = tuple[disnake.AuditLogAction, int]
+
+
+class AuditEntryCache:
+    # recent audit log entries as they come in over the gateway, keyed by (action, target).
+    # only entries someone said they'd look up are kept, so bulk bans don't flood it
+    def __init__(self, ttl: datetime.timedelta, max_entries: int):
+        self._entries: TTLCache[AuditKey, disnake.AuditLogEntry] = TTLCache(
+            ttl=ttl, max_entries=max_entries
+        )
+        self._expected: TTLCache[AuditKey, bool] = TTLCache(
+            ttl=ttl, max_entries=max_entries
+        )
+        self._waiters: dict[AuditKey, list[asyncio.Future[disnake.AuditLogEntry]]] = {}
+        self.hits = 0
+        self.waited = 0
+        self.misses = 0
+
+    def add(self, entry: disnake.AuditLogEntry):
+        if entry.target is None:
+            return
+        key = (entry.action, int(entry.target.id))
+        if self._expected.pop(key) is None and key not in self._waiters:
+            return
+        waiters = self._waiters.get(key, [])
+        for waiter in waiters:
+            if not waiter.done():
+                # handed straight to whoever was waiting, so it isn't cached for reuse.
+                # any other waiters stay registered for the next entry
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[key]
+                waiter.set_result(entry)
+                return
+        self._entries.set(key, entry, size=0)
+
+    def expect(self, action: disnake.AuditLogAction, target: int):
+        # call before the action so its entry is kept even if it arrives before take()
+        self._expected.set((action, target), True, size=0)
+
+    async def take(
+        self, action: disnake.AuditLogAction, target: int, timeout: float = 0
+    ) -> disnake.AuditLogEntry | None:
+        # entries are consumed so a later ban of the same user can't pick up a stale one
+        key = (action, target)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.pop(key)
+            self.hits += 1
+            return entry
+        if timeout <= 0:
+            self.misses += 1
+            return None
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, []).append(waiter)
+        try:
+            entry = await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self.misses += 1
+            return None
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[key]
+        self.waited += 1
+        return entry
+
+
+class HistoryView(disnake.ui.View):
+    def __init__(
+        self,
+        cog: "ModerationCog",
+        query: dict[str, Any],
+        title: str,
+        author_id: int,
+    ):
+        super().__init__(timeout=5 * 60)
+        self.cog = cog
+        self.query = query
+        self.title = title
+        self.author_id = author_id
+        self.page = 1
+        self.docs: list[BanDoc] = []
+        self.has_newer = False
+        self.has_older = False
+        self.message: disnake.Message | None = None
+
+    async def load(self, after: BanDoc | None = None, before: BanDoc | None = None):
+        docs, more = await self.cog.search_bans(self.query, after=after, before=before)
+        if not docs:
+            # whatever was on the other side got deleted, stay on the current page
+            self.has_older = self.has_older and before is not None
+            self.has_newer = self.has_newer and after is not None
+            return
+        self.docs = docs
+        if before is not None:
+            self.page -= 1
+            self.has_newer, self.has_older = more, True
+        else:
+            self.page += after is not None
+            self.has_newer, self.has_older = after is not None, more
+
+    def make_embed(self) -> disnake.Embed:
+        embed = disnake.Embed(title=self.title, color=disnake.Color.blurple())
+        if not self.docs:
+            embed.description = "No bans found"
+        for doc in self.docs:
+            lines = [
+                f"__Discord:__ <@{doc['discordId']}> ({doc['discordId']})",
+                f"__Moderator:__ <@{doc['bannedBy']}>"
+                if doc["bannedBy"]
+                else "__Moderator:__ Unknown",
+            ]
+            if doc["uuid"]:
+                lines.append(f"__Minecraft:__ `{doc['uuid']}`")
+            unban = doc["unban"]
+            if unban:
+                by = f" by <@{unban['unbannedBy']}>" if unban["unbannedBy"] else ""
+                lines.append(
+                    f"__Unbanned:__ {disnake.utils.format_dt(as_utc(unban['date']), 'f')}{by}"
+                    f" - {unban['reason'] or 'No reason'}"
+                )
+            else:
+                lines.append("__Unbanned:__ Still banned")
+            lines.append(f"```\n{doc['reason'] or 'No reason'}\n```")
+            embed.add_field(
+                name=f"Ban {disnake.utils.format_dt(as_utc(doc['date']), 'f')}",
+                value="\n".join(lines)[:1024],
+                inline=False,
+            )
+        embed.set_footer(text=f"Page {self.page}")
+        self.newer_button.disabled = not self.has_newer
+        self.older_button.disabled = not self.has_older
+        return embed
+
+    async def interaction_check(self, inter: disnake.MessageInteraction) -> bool:
+        if inter.author.id == self.author_id:
+            return True
+        await inter.response.send_message(
+            embed=self.cog.UtilsCog.make_error(
+                title="Not Your Menu",
+                description="Run `/moderation history` yourself to page through bans",
+            ),
+            ephemeral=True,
+        )
+        return False
+
+    async def on_timeout(self):
+        if self.message is None:
+            return
+        self.newer_button.disabled = True
+        self.older_button.disabled = True
+        try:
+            await self.message.edit(view=self)
+        except disnake.HTTPException:
+            pass
+
+    @disnake.ui.button(label="Newer", emoji="◀️", style=disnake.ButtonStyle.secondary)
+    async def newer_button(
+        self, _: disnake.ui.Button, inter: disnake.MessageInteraction
+    ):
+        await self.load(before=self.docs[0])
+        await inter.response.edit_message(embed=self.make_embed(), view=self)
+
+    @disnake.ui.button(label="Older", emoji="▶️", style=disnake.ButtonStyle.secondary)
+    async def older_button(
+        self, _: disnake.ui.Button, inter: disnake.MessageInteraction
+    ):
+        await self.load(after=self.docs[-1])
+        await inter.response.edit_message(embed=self.make_embed(), view=self)
+
+
 class ModerationCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.task: asyncio.Task | None = None
         self.ban_db = mongodb.Collection(constants.BAN_COLLECTION_NAME)
+        self.audit_entries = AuditEntryCache(ttl=AUDIT_ENTRY_TTL, max_entries=1_000)
 
     @property
     def UtilsCog(self) -> "UtilsCog":
@@ -142,6 +372,7 @@ class ModerationCog(commands.Cog):
                 member, content=constants.APPEALS_INVITE_URL, embed=embed
             ),
         )
+        self.audit_entries.expect(disnake.AuditLogAction.ban, member.id)
         await member.ban(
             reason=self.format_audit_reason(inter.author, reason),
             clean_history_duration=delete_messages,
@@ -158,6 +389,74 @@ class ModerationCog(commands.Cog):
             )
         )
 
+    @moderation.sub_command(
+        name="massban", description="Ban many users at once, e.g. during a raid"
+    )
+    async def mass_ban_command(
+        self,
+        inter: disnake.AppCmdInter,
+        reason: str = commands.Param(
+            description="The reason for the bans. Please write a concise, well though out reason"
+        ),
+        user_ids: str | None = commands.Param(
+            default=None,
+            description="User IDs to ban, separated by spaces or commas",
+        ),
+        joined_within: int | None = commands.Param(
+            default=None,
+            description="Also ban every member who joined within this window",
+            choices=JOIN_WINDOWS,
+        ),
+        delete_messages: int = commands.Param(
+            description="How much of their message history to wipe. Defaults to 0",
+            choices=MESSAGE_CLEAN_TIMES,
+            default=0,
+        ),
+    ):
+        if user_ids is None and joined_within is None:
+            return await inter.response.send_message(
+                embed=self.UtilsCog.make_error(
+                    title="Invalid Arguments",
+                    description="Provide user IDs, a join window or both",
+                ),
+                ephemeral=True,
+            )
+        targets = {int(user_id) for user_id in re.findall(r"\d{15,20}", user_ids or "")}
+        if joined_within is not None:
+            cutoff = disnake.utils.utcnow() - datetime.timedelta(seconds=joined_within)
+            targets.update(
+                member.id
+                for member in self.UtilsCog.chub.members
+                if member.joined_at and member.joined_at >= cutoff and not member.bot
+            )
+        targets = {
+            target
+            for target in targets
+            if target not in (inter.author.id, self.bot.user.id)
+            and not self.UtilsCog.is_staff(target)
+        }
+        if not targets or len(targets) > MASS_BAN_LIMIT:
+            return await inter.response.send_message(
+                embed=self.UtilsCog.make_error(
+                    title="Invalid Targets",
+                    description=f"Matched {len(targets)} users, a mass ban needs between 1 and {MASS_BAN_LIMIT}",
+                ),
+                ephemeral=True,
+            )
+        await inter.response.defer()
+        banned, failed = await self.mass_ban(
+            sorted(targets),
+            user=inter.author,
+            reason=reason,
+            clean_history_duration=delete_messages,
+        )
+        await inter.send(
+            embed=self.UtilsCog.make_success(
+                title="Mass Banned",
+                description=f"Banned {len(banned)} users from Collector's Hub, {len(failed)} could not be banned",
+            )
+        )
+
     @moderation.sub_command(name="unban", description="Unban a member", guild_ids=[constants.GUILD_ID, constants.APPEALS_GUILD_ID])
     async def unban_command(
         self,
@@ -170,6 +469,7 @@ class ModerationCog(commands.Cog):
         ),
     ):
         await inter.response.defer()
+        self.audit_entries.expect(disnake.AuditLogAction.unban, user.id)
         try:
             await self.UtilsCog.chub.unban(
                 user, reason=self.format_audit_reason(inter.author, reason)
@@ -277,11 +577,284 @@ class ModerationCog(commands.Cog):
             ),
         )
 
+    @moderation.sub_command(name="history", description="View a user's ban history")
+    async def history_command(
+        self,
+        inter: disnake.AppCmdInter,
+        user: disnake.User | None = commands.Param(
+            default=None, description="The Discord user to look up"
+        ),
+        ign: str | None = commands.Param(
+            default=None,
+            description="The Minecraft username or UUID to look up",
+            autocomplete=autocomplete.ign,
+            min_length=1,
+            max_length=36,
+        ),
+    ):
+        if (user is None) == (ign is None):
+            return await inter.response.send_message(
+                embed=self.UtilsCog.make_error(
+                    title="Invalid Arguments",
+                    description="Provide either a Discord user or a Minecraft account",
+                ),
+                ephemeral=True,
+            )
+        await inter.response.defer()
+        if user is not None:
+            query: dict[str, Any] = {"discordId": user.id}
+            title = f"Ban History for {user}"
+        else:
+            player = await mojang.get_player(cast(str, ign))
+            query = {"uuid": player.uuid}
+            title = f"Ban History for {player.name}"
+        view = HistoryView(self, query=query, title=title, author_id=inter.author.id)
+        await view.load()
+        await inter.send(embed=view.make_embed(), view=view)
+        view.message = await inter.original_response()
+
+    async def search_bans(
+        self,
+        query: dict[str, Any],
+        after: BanDoc | None = None,
+        before: BanDoc | None = None,
+        limit: int = HISTORY_PAGE_SIZE,
+    ) -> tuple[list[BanDoc], bool]:
+        # keyset pagination over (date, _id) newest first, so every page is one bounded
+        # index range scan no matter how deep it is. returns the page and whether there are
+        # more docs past it in the direction being paged
+        sort = {"date": -1, "_id": -1}
+        if after is not None:
+            query = {
+                **query,
+                "$or": [
+                    {"date": {"$lt": after["date"]}},
+                    {"date": after["date"], "_id": {"$lt": after["_id"]}},
+                ],
+            }
+        elif before is not None:
+            query = {
+                **query,
+                "$or": [
+                    {"date": {"$gt": before["date"]}},
+                    {"date": before["date"], "_id": {"$gt": before["_id"]}},
+                ],
+            }
+            sort = {"date": 1, "_id": 1}
+        docs = cast(
+            "list[BanDoc]",
+            await self.ban_db.get_many(
+                query, projection=HISTORY_PROJECTION, sort=sort, limit=limit + 1
+            ),
+        )
+        more = len(docs) > limit
+        docs = docs[:limit]
+        if before is not None:
+            docs.reverse()
+        return docs, more
+
+    async def mass_ban(
+        self,
+        targets: list[int],
+        user: disnake.User | disnake.Member,
+        reason: str,
+        clean_history_duration: int = 0,
+    ) -> tuple[list[int], list[int]]:
+        # skips the per-member dm, audit lookup and embed of a normal ban, which is what
+        # makes /moderation ban far too slow during a raid
+        banned: list[int] = []
+        failed: list[int] = []
+        for i in range(0, len(targets), BULK_BAN_SIZE):
+            chunk = targets[i : i + BULK_BAN_SIZE]
+            try:
+                result = await self.UtilsCog.chub.bulk_ban(
+                    [disnake.Object(target) for target in chunk],
+                    clean_history_duration=clean_history_duration,
+                    reason=self.format_audit_reason(user, reason),
+                )
+            except disnake.Forbidden as e:
+                if not banned:
+                    raise
+                # lost permissions midway, still record and log everyone already banned
+                print(f"[ModerationCog] Bulk ban stopped, missing permissions: {e}")
+                failed.extend(targets[i:])
+                break
+            except disnake.HTTPException as e:
+                # discord errors out when nobody in the chunk could be banned
+                print(f"[ModerationCog] Bulk ban of {len(chunk)} users failed: {e}")
+                failed.extend(chunk)
+                continue
+            banned.extend(target.id for target in result.banned)
+            failed.extend(target.id for target in result.failed)
+        if not banned:
+            return banned, failed
+
+        date = disnake.utils.utcnow()
+        links = await self.LinkingCog.search_verifications(banned)
+        await self.ban_db.bulk_write(
+            [
+                # upsert on the active ban so a user who was already banned isn't doubled
+                UpdateOne(
+                    {"discordId": target, "unban": None},
+                    {
+                        "$setOnInsert": {
+                            "_id": new_ban_id(date),
+                            "discordId": target,
+                            "uuid": links[target]["uuid"] if target in links else None,
+                            "date": date,
+                            "bannedBy": user.id,
+                            "reason": reason,
+                            "unban": None,
+                        }
+                    },
+                    upsert=True,
+                )
+                for target in banned
+            ],
+            ordered=False,
+        )
+        mentions = " ".join(f"<@{target}>" for target in banned)
+        embed = disnake.Embed(
+            title=f"{len(banned)} Users Were Mass Banned!",
+            color=MOD_ACTION_INFO[ModAction.BAN]["color"],
+            timestamp=date,
+            description=mentions[:4000] + ("..." if len(mentions) > 4000 else ""),
+        )
+        embed.set_footer(
+            text=f"Moderator: {user.display_name} ({user.id})",
+            icon_url=user.display_avatar.url,
+        )
+        embed.add_field(name="Reason", value=f"```\n{reason}\n```", inline=False)
+        embed.add_field(name="Linked Accounts", value=str(len(links)))
+        if failed:
+            embed.add_field(name="Failed", value=str(len(failed)))
+        await self.UtilsCog.send_message(
+            channel_id=constants.MOD_LOG_CHANNEL_ID,
+            embed=embed,
+        )
+        return banned, failed
+
+    async def reconcile_bans(self) -> dict[str, int]:
+        # discord pages bans in ascending user id order, so walking an id-sorted cursor of
+        # active mongo bans alongside it is a merge join with flat memory use
+        started = disnake.utils.utcnow()
+        counts = {"scanned": 0, "matched": 0, "added": 0, "closed": 0}
+        operations: list[UpdateOne] = []
+        # missing bans wait here so each flush resolves their links in one lookup
+        missing: list[BanDoc] = []
+        cursor = aiter(
+            self.ban_db.iterate(
+                {"unban": None},
+                projection={"discordId": 1, "date": 1},
+                sort={"discordId": 1},
+            )
+        )
+        doc = await anext(cursor, None)
+
+        async def flush():
+            if missing:
+                links = await self.LinkingCog.search_verifications(
+                    [ban_doc["discordId"] for ban_doc in missing]
+                )
+                for ban_doc in missing:
+                    link = links.get(ban_doc["discordId"])
+                    ban_doc["uuid"] = link["uuid"] if link else None
+                    # upsert on the active ban so a live on_ban racing us isn't duplicated
+                    operations.append(
+                        UpdateOne(
+                            {"discordId": ban_doc["discordId"], "unban": None},
+                            {"$setOnInsert": ban_doc},
+                            upsert=True,
+                        )
+                    )
+                missing.clear()
+            if operations:
+                await self.ban_db.bulk_write(operations.copy(), ordered=False)
+                operations.clear()
+
+        def close(doc: dict[str, Any]):
+            # bans recorded after we started may just not be in the pages we already read
+            if doc["date"] >= started.replace(tzinfo=None):
+                return
+            counts["closed"] += 1
+            operations.append(
+                UpdateOne(
+                    {"_id": doc["_id"], "unban": None},
+                    {
+                        "$set": {
+                            "unban": {
+                                "id": None,
+                                "unbannedBy": None,
+                                "reason": "Unbanned while the bot was offline",
+                                "date": started,
+                            }
+                        }
+                    },
+                )
+            )
+
+        async for ban in self.UtilsCog.chub.bans(limit=None):
+            counts["scanned"] += 1
+            user_id = ban.user.id
+            while doc is not None and doc["discordId"] < user_id:
+                close(doc)
+                doc = await anext(cursor, None)
+            if doc is not None and doc["discordId"] == user_id:
+                counts["matched"] += 1
+                while doc is not None and doc["discordId"] == user_id:
+                    doc = await anext(cursor, None)
+            else:
+                counts["added"] += 1
+                missing.append(
+                    {
+                        "_id": new_ban_id(started),
+                        "discordId": user_id,
+                        "uuid": None,
+                        "date": started,
+                        "bannedBy": None,
+                        "reason": ban.reason or "Banned while the bot was offline",
+                        "unban": None,
+                    }
+                )
+            if len(operations) + len(missing) >= RECONCILE_BATCH:
+                await flush()
+        while doc is not None:
+            close(doc)
+            doc = await anext(cursor, None)
+        await flush()
+
+        elapsed = disnake.utils.utcnow() - started
+        print(f"[ModerationCog] Ban reconciliation finished in {elapsed}: {counts}")
+        if counts["added"] or counts["closed"]:
+            await self.UtilsCog.send_message(
+                channel_id=constants.MOD_LOG_CHANNEL_ID,
+                embed=disnake.Embed(
+                    title="Ban Records Reconciled",
+                    color=disnake.Color.orange(),
+                    timestamp=datetime.datetime.now(),
+                    description=(
+                        f"Checked {counts['scanned']} Discord bans against the ban records\n"
+                        f"__Already recorded:__ {counts['matched']}\n"
+                        f"__Missing, now recorded:__ {counts['added']}\n"
+                        f"__No longer banned, now closed:__ {counts['closed']}"
+                    ),
+                ),
+            )
+        return counts
+
+    async def main(self):
+        while True:
+            try:
+                await self.reconcile_bans()
+            except Exception as e:
+                print(f"[ModerationCog] Ban reconciliation failed: {e}")
+            await asyncio.sleep(RECONCILE_INTERVAL.total_seconds())
+
     async def search_ban(self, discord_id: int) -> BanDoc | None:
         docs: list[BanDoc] = cast(
             "list[BanDoc]",
             await self.ban_db.get_many(
-                {"discordId": discord_id, "unban": None}, sort={"date": -1}
+                {"discordId": discord_id, "unban": None}, sort={"date": -1}, limit=1
             ),
         )
         return docs[0] if docs else None
@@ -289,14 +862,15 @@ class ModerationCog(commands.Cog):
     async def find_audit_entry(
         self, target: int, type_: BanUpdateType
     ) -> disnake.AuditLogEntry | None:
-        async for entry in self.UtilsCog.chub.audit_logs(
-            limit=10,
-            action=(
-                disnake.AuditLogAction.unban
-                if type_ == BanUpdateType.UNBAN
-                else disnake.AuditLogAction.ban
-            ),
-        ):
+        action = (
+            disnake.AuditLogAction.unban
+            if type_ == BanUpdateType.UNBAN
+            else disnake.AuditLogAction.ban
+        )
+        entry = await self.audit_entries.take(action, target, timeout=AUDIT_ENTRY_WAIT)
+        if entry is not None:
+            return entry
+        async for entry in self.UtilsCog.chub.audit_logs(limit=10, action=action):
             if entry.target and entry.target.id == target:
                 return entry
         return None
@@ -489,6 +1063,15 @@ class ModerationCog(commands.Cog):
 
     @commands.Cog.listener()
     async def on_audit_log_entry_create(self, entry: disnake.AuditLogEntry):
+        # bans/unbans made through our own commands look their entry up here, anything
+        # else is handled right below and never needs a lookup
+        if (
+            entry.user
+            and entry.user.id == self.bot.user.id
+            and entry.action
+            in (disnake.AuditLogAction.ban, disnake.AuditLogAction.unban)
+        ):
+            self.audit_entries.add(entry)
         if (entry.user and entry.user.id == self.bot.user.id) or not entry.target:
             return
         if entry.action == disnake.AuditLogAction.ban:
@@ -509,5 +1092,13 @@ class ModerationCog(commands.Cog):
                 date=entry.created_at,
             )
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.main())
+
     async def close(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            self.task = None
         await self.ban_db.close()
@@ -43,8 +43,14 @@ APPEALS_INVITE_URL: str = "https://discord.gg/6VAAvW7pAm"
 MC_AVATAR_URL: str = "http://cravatar.eu/helmavatar/{}.png"
 MC_SKIN_URL: str = "https://vzge.me/full/832/{}.png?y=-40"
 NAMEMC_URL: str = "https://nmc.is/{}"
+HYPIXEL_API_URL: str = "https://api.hypixel.net/v2"
 MOJANG_API_URL: str = "https://mowojang.matdoes.dev/{}"
+MOJANG_BULK_API_URL: str = (
+    "https://api.minecraftservices.com/minecraft/profile/lookup/bulk/byname"
+)
 IGN_STEM_URL: str = "https://api.ragingenby.dev/stem/{}"
+# most players IGN_STEM_URL returns for one stem, fewer means that's every match
+IGN_STEM_LIMIT: int = 10
 DISCORD_USER_URL: str = "https://discord.com/users/{}"
 
 # Regex
@@ -57,3 +63,13 @@ USERNAME_REGEX: str = r"^[A-Za-z0-9_]{3,16}$"
 DB_NAME: str = "CHUB"
 LINKED_COLLECTION_NAME: str = "linked_members"
 BAN_COLLECTION_NAME: str = "bans"
+MONGODB_MAX_POOL_SIZE: int = 20
+MONGODB_MIN_POOL_SIZE: int = 2
+MONGODB_MAX_IDLE_TIME_MS: int = 5 * 60 * 1000
+
+# Member sync
+SYNC_WORKERS: int = 4
+# joins waiting for their first sync, anything past this is left to the next sweep
+SYNC_INTAKE_SIZE: int = 500
+# seconds a member's hypixel data counts as fresh before a sweep fetches it again
+SYNC_FRESH_FOR: int = 30 * 60
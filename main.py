@@ -9,7 +9,7 @@ from disnake.ext import commands
 
 if TYPE_CHECKING:
     from cogs import UtilsCog as UtilsCogType
-from modules import asyncreqs
+from modules import asyncreqs, mongodb
 import constants
 import cogs
 
@@ -55,6 +55,10 @@ async def on_ready():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     print(f"Logged in as {bot.user}")
+    await asyncreqs.warmup()
+    print("Asyncreqs warmed up")
+    await mongodb.ensure_indexes()
+    print("MongoDB indexes ensured")
 
 
 async def close_cog(cog: commands.Cog):
@@ -67,6 +71,8 @@ async def close():
     print("Cogs closed")
     await asyncreqs.close()
     print("Asyncreqs closed")
+    await mongodb.close()
+    print("MongoDB closed")
     await bot.close()
     print("Bot closed")
 
@@ -1,24 +1,196 @@
+from contextlib import suppress
+from urllib.parse import urlsplit
+import asyncio
+import random
 import curl_cffi as curl
+from curl_cffi.requests import exceptions as curl_exceptions
 import constants
 
 
-_session: curl.AsyncSession | None = None
+class RetryPolicy:
+    def __init__(
+        self,
+        connect_timeout: float = 5,
+        read_timeout: float = 10,
+        attempts: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 8,
+        retry_statuses: frozenset[int] = frozenset({500, 502, 503, 504}),
+        retry_exceptions: tuple[type[Exception], ...] = (
+            curl_exceptions.Timeout,
+            curl_exceptions.ConnectionError,
+        ),
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.attempts = max(attempts, 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.retry_exceptions = retry_exceptions
 
+    @property
+    def timeout(self) -> tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
 
-async def get_session() -> curl.AsyncSession:
-    global _session
-    if _session is None:
-        _session = curl.AsyncSession()
-    return _session
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        # "full jitter" exponential backoff so retrying callers don't stampede together
+        delay = random.uniform(0, min(self.backoff * 2**attempt, self.max_backoff))
+        if retry_after is not None:
+            # never retry sooner than the server asked us to
+            delay = max(delay, retry_after)
+        return delay
+
+
+def get_retry_after(response: curl.Response) -> float | None:
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+DEFAULT_POLICY = RetryPolicy()
+# keyed by hostname, anything not listed here uses DEFAULT_POLICY
+POLICIES: dict[str, RetryPolicy] = {
+    # hypixel 429s are handled by hypixel's rate limit governor, never retry those here
+    "api.hypixel.net": RetryPolicy(read_timeout=10, attempts=2),
+    "mowojang.matdoes.dev": RetryPolicy(
+        read_timeout=5,
+        attempts=4,
+        retry_statuses=frozenset({429, 500, 502, 503, 504}),
+    ),
+    "api.minecraftservices.com": RetryPolicy(read_timeout=5, attempts=2),
+    # autocomplete has a hard deadline, a slow stem lookup is better dropped than retried
+    "api.ragingenby.dev": RetryPolicy(connect_timeout=2, read_timeout=3, attempts=1),
+}
+
+
+class HostLimits:
+    def __init__(
+        self,
+        concurrency: int = 10,
+        pool_size: int | None = None,
+        keepalive: int = 120,
+        http2: bool = False,
+    ):
+        self.concurrency = concurrency
+        self.pool_size = pool_size or concurrency
+        self.keepalive = keepalive
+        self.http2 = http2
+
+
+DEFAULT_LIMITS = HostLimits()
+# every host gets its own session and semaphore so a burst against one can't starve the rest
+LIMITS: dict[str, HostLimits] = {
+    # hypixel goes through the proxy with chrome impersonation which picks its own http version
+    "api.hypixel.net": HostLimits(concurrency=8),
+    "mowojang.matdoes.dev": HostLimits(concurrency=16, http2=True),
+    "api.minecraftservices.com": HostLimits(concurrency=4, http2=True),
+    "api.ragingenby.dev": HostLimits(concurrency=8, http2=True),
+}
+
+
+_sessions: dict[str, curl.AsyncSession] = {}
+_semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+def get_host(url: str) -> str:
+    return urlsplit(url).hostname or ""
+
+
+def get_limits(host: str) -> HostLimits:
+    return LIMITS.get(host, DEFAULT_LIMITS)
+
+
+def get_semaphore(host: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(host)
+    if semaphore is None:
+        semaphore = _semaphores[host] = asyncio.Semaphore(get_limits(host).concurrency)
+    return semaphore
+
+
+async def get_session(host: str = "") -> curl.AsyncSession:
+    # unknown hosts all share the "" session
+    host = host if host in LIMITS else ""
+    session = _sessions.get(host)
+    if session is None:
+        limits = get_limits(host)
+        session = _sessions[host] = curl.AsyncSession(
+            max_clients=limits.pool_size,
+            http_version="v2tls" if limits.http2 else None,
+            curl_options={curl.CurlOpt.MAXAGE_CONN: limits.keepalive},
+        )
+    return session
 
 
 async def close():
-    if _session is not None:
-        await _session.close()
+    while _sessions:
+        _, session = _sessions.popitem()
+        await session.close()
 
 
-async def get(url: str, *args, **kwargs) -> curl.Response:
+_WARM_POLICY = RetryPolicy(connect_timeout=5, read_timeout=5, attempts=1)
+
+
+async def warm(host: str):
+    # open a connection (dns, tcp, tls, proxy tunnel) to host so the next request reuses it
+    with suppress(Exception):
+        await request("HEAD", f"https://{host}/", policy=_WARM_POLICY)
+
+
+async def warmup():
+    # warm every known host ahead of the first command
+    await asyncio.gather(*[warm(host) for host in LIMITS])
+
+
+def get_policy(url: str) -> RetryPolicy:
+    return POLICIES.get(get_host(url), DEFAULT_POLICY)
+
+
+async def request(
+    method: curl.requests.HttpMethod,
+    url: str,
+    *args,
+    policy: RetryPolicy | None = None,
+    **kwargs,
+) -> curl.Response:
+    host = get_host(url)
+    policy = policy or get_policy(url)
+    kwargs.setdefault("timeout", policy.timeout)
     proxy = constants.PROXY if "hypixel.net" in url and constants.PROXY else None
     impersonate: curl.BrowserTypeLiteral | None = "chrome" if proxy else None
-    session = await get_session()
-    return await session.get(url, *args, **kwargs, proxy=proxy, impersonate=impersonate)
+    session = await get_session(host)
+    semaphore = get_semaphore(host)
+    for attempt in range(policy.attempts):
+        last_attempt = attempt == policy.attempts - 1
+        retry_after: float | None = None
+        try:
+            # only hold the slot while actually on the wire, not while backing off
+            async with semaphore:
+                response = await session.request(
+                    method, url, *args, **kwargs, proxy=proxy, impersonate=impersonate
+                )
+        except policy.retry_exceptions as e:
+            if last_attempt:
+                raise
+            print(f"[asyncreqs] {method} {url} failed ({e}), retrying")
+        else:
+            if last_attempt or response.status_code not in policy.retry_statuses:
+                return response
+            retry_after = get_retry_after(response)
+            if retry_after is not None and retry_after > policy.max_backoff:
+                # waiting that long inside a request isn't worth it, let the caller decide
+                return response
+            print(
+                f"[asyncreqs] {method} {url} returned {response.status_code}, retrying"
+            )
+        await asyncio.sleep(policy.delay(attempt, retry_after))
+    raise AssertionError("unreachable")
+
+
+async def get(url: str, *args, **kwargs) -> curl.Response:
+    return await request("GET", url, *args, **kwargs)
+
+
+async def post(url: str, *args, **kwargs) -> curl.Response:
+    return await request("POST", url, *args, **kwargs)
@@ -1,16 +1,270 @@
 import disnake
 import asyncio
+import bisect
+import datetime
+import itertools
 
-from modules import ragingenbyapi
+from modules import asyncreqs, cache, mojang, ragingenbyapi
 import constants
 
+# discord drops autocomplete responses after ~3s, leave headroom for our reply to get there
+DEADLINE = datetime.timedelta(seconds=2)
+_MIN_REMOTE_BUDGET = 0.25
+# wait this long for the next keystroke before hitting the network, 0 disables it
+DEBOUNCE = datetime.timedelta(0)
+stats: dict[str, int] = {
+    "attached": 0,
+    "refetched": 0,
+    "cancelled": 0,
+    "debounced": 0,
+}
+_keystroke_ids = itertools.count()
+# latest keystroke and in-flight lookup per (user id, field)
+_latest: dict[tuple[int, str], int] = {}
+_lookups: dict[tuple[int, str], "_Lookup"] = {}
+# resolve mojang and warm the hypixel connection for the choice the user is most likely
+# about to submit. hypixel data itself isn't prefetched, /verify has to see fresh socials
+PREFETCH_TOP = 2
+_MAX_PREFETCHES = 4
+prefetch_stats: dict[str, int] = {
+    "started": 0,
+    "skipped": 0,
+    "failed": 0,
+    "hits": 0,
+    "misses": 0,
+}
+# uuids whose prefetch actually completed, claim_prefetch only counts these as hits
+_prefetched: cache.TTLCache[str, bool] = cache.TTLCache(
+    ttl=datetime.timedelta(seconds=60), max_entries=1_000
+)
+# running prefetches by uuid, so the same player isn't prefetched twice at once
+_prefetches: dict[str, asyncio.Task] = {}
+
+
+class PlayerIndex:
+    def __init__(self):
+        # (lowercase name, uuid) kept sorted so prefix searches are a bisect away
+        self._names: list[tuple[str, str]] = []
+        self._players: dict[str, mojang.Player] = {}
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __contains__(self, uuid: str) -> bool:
+        return uuid in self._players
+
+    def add(self, player: mojang.Player):
+        self.remove(player.uuid)
+        self._players[player.uuid] = player
+        bisect.insort(self._names, (player.name.lower(), player.uuid))
+
+    def remove(self, uuid: str):
+        player = self._players.pop(uuid, None)
+        if player is None:
+            return
+        key = (player.name.lower(), uuid)
+        i = bisect.bisect_left(self._names, key)
+        if i < len(self._names) and self._names[i] == key:
+            del self._names[i]
+
+    def clear(self):
+        self._names.clear()
+        self._players.clear()
+
+    def search(self, prefix: str, limit: int = 25) -> list[mojang.Player]:
+        prefix = prefix.lower()
+        players: list[mojang.Player] = []
+        for name, uuid in itertools.islice(
+            self._names, bisect.bisect_left(self._names, (prefix,)), None
+        ):
+            if not name.startswith(prefix) or len(players) >= limit:
+                break
+            players.append(self._players[uuid])
+        return players
+
+
+linked_players = PlayerIndex()
+
 
 def log_autocomplete(inter: disnake.AppCmdInter, user_input: str, field: str):
     print(f"[Autocomplete - {field} - {inter.author.name}] '{user_input}'")
 
 
+def remaining_budget(inter: disnake.AppCmdInter) -> float:
+    elapsed = disnake.utils.utcnow() - inter.created_at
+    # clamp so clock skew between us and discord can't zero out or inflate the budget
+    return min(
+        max((DEADLINE - elapsed).total_seconds(), _MIN_REMOTE_BUDGET),
+        DEADLINE.total_seconds(),
+    )
+
+
+def local_choices(user_input: str) -> list[disnake.OptionChoice]:
+    return [
+        disnake.OptionChoice(name=ign, value=ign)
+        for ign in constants.ADMIN_IGNS
+        if ign.lower().startswith(user_input)
+    ] + [
+        disnake.OptionChoice(name=player.name, value=player.uuid)
+        for player in linked_players.search(user_input)
+    ]
+
+
+class _Lookup:
+    __slots__ = ("stem", "task")
+
+    def __init__(self, stem: str, task: asyncio.Task[list[mojang.Player]]):
+        self.stem = stem
+        self.task = task
+
+
+async def remote_players(
+    inter: disnake.AppCmdInter, field: str, user_input: str, timeout: float
+) -> list[mojang.Player]:
+    key = (inter.author.id, field)
+    keystroke = _latest[key] = next(_keystroke_ids)
+    try:
+        return await _remote_players(key, keystroke, user_input, timeout)
+    finally:
+        if _latest.get(key) == keystroke:
+            del _latest[key]
+
+
+async def _remote_players(
+    key: tuple[int, str], keystroke: int, user_input: str, timeout: float
+) -> list[mojang.Player]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    previous = _lookups.get(key)
+    if previous is not None and not previous.task.done():
+        if user_input.startswith(previous.stem):
+            # the user is still typing the same name, piggyback on the lookup in flight
+            stats["attached"] += 1
+            await _wait(previous.task, timeout)
+            cached = ragingenbyapi.get_cached_ign_stem(user_input)
+            if cached is not None:
+                return cached
+            # the shorter stem's answer was capped, so it can't rule out longer names.
+            # look this input up itself with whatever is left of the deadline
+            stats["refetched"] += 1
+        else:
+            # they backspaced or typed something else, nobody will see the old answer
+            stats["cancelled"] += 1
+            previous.task.cancel()
+    if DEBOUNCE:
+        await asyncio.sleep(DEBOUNCE.total_seconds())
+        if _latest.get(key) != keystroke:
+            stats["debounced"] += 1
+            return []
+    task = asyncio.ensure_future(ragingenbyapi.search_ign_stem(user_input))
+    _lookups[key] = _Lookup(user_input, task)
+    task.add_done_callback(lambda t: _finished(key, t))
+    return await _wait(task, deadline - loop.time())
+
+
+async def _wait(
+    task: asyncio.Task[list[mojang.Player]], timeout: float
+) -> list[mojang.Player]:
+    try:
+        # shield it so a late answer still lands in the stem cache for the next keystroke
+        return await asyncio.wait_for(asyncio.shield(task), timeout=max(timeout, 0))
+    except TimeoutError:
+        return []
+    except asyncio.CancelledError:
+        current = asyncio.current_task()
+        if task.cancelled() and not (current and current.cancelling()):
+            return []  # superseded by a newer keystroke
+        raise
+
+
+def _finished(key: tuple[int, str], task: asyncio.Task[list[mojang.Player]]):
+    lookup = _lookups.get(key)
+    if lookup is not None and lookup.task is task:
+        del _lookups[key]
+    if not task.cancelled() and task.exception():
+        print(f"[Autocomplete] Stem lookup failed: {task.exception()}")
+
+
+def prefetch(choices: list[disnake.OptionChoice], user_input: str):
+    players = [
+        mojang.Player(uuid=str(choice.value), name=choice.name)
+        for choice in choices
+        if isinstance(choice.value, str) and mojang.is_uuid(choice.value)
+    ]
+    exact = [player for player in players if player.name.lower() == user_input]
+    # only speculate once the input has narrowed things down, not on every keystroke
+    if exact:
+        players = exact
+    elif len(players) > PREFETCH_TOP:
+        return
+    for player in players[:PREFETCH_TOP]:
+        if (
+            player.uuid in _prefetches
+            or _prefetched.get(player.uuid)
+            or len(_prefetches) >= _MAX_PREFETCHES
+        ):
+            prefetch_stats["skipped"] += 1
+            continue
+        prefetch_stats["started"] += 1
+        task = asyncio.create_task(_prefetch(player))
+        _prefetches[player.uuid] = task
+        task.add_done_callback(lambda t, uuid=player.uuid: _prefetch_done(uuid, t))
+
+
+async def _prefetch(player: mojang.Player):
+    player, _ = await asyncio.gather(
+        mojang.get_player(player.uuid),
+        asyncreqs.warm(asyncreqs.get_host(constants.HYPIXEL_API_URL)),
+    )
+    _prefetched.set(player.uuid, True, size=0)
+
+
+def _prefetch_done(uuid: str, task: asyncio.Task):
+    if _prefetches.get(uuid) is task:
+        del _prefetches[uuid]
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error:
+        prefetch_stats["failed"] += 1
+        print(f"[Autocomplete] Prefetch failed: {error}")
+
+
+def claim_prefetch(player: mojang.Player) -> bool:
+    hit = _prefetched.pop(player.uuid) is not None
+    prefetch_stats["hits" if hit else "misses"] += 1
+    return hit
+
+
+def merge_choices(
+    *groups: list[disnake.OptionChoice],
+) -> list[disnake.OptionChoice]:
+    seen: set[str | int | float] = set()
+    choices: list[disnake.OptionChoice] = []
+    for group in groups:
+        for choice in group:
+            if choice.value in seen or choice.name.lower() in seen:
+                continue
+            seen.update((choice.value, choice.name.lower()))
+            choices.append(choice)
+    return choices[:25]
+
+
 async def ign(
     inter: disnake.AppCmdInter, user_input: str
+) -> list[disnake.OptionChoice]:
+    return await _ign(inter, user_input, speculate=False)
+
+
+async def verify_ign(
+    inter: disnake.AppCmdInter, user_input: str
+) -> list[disnake.OptionChoice]:
+    # same as ign, plus prefetching the likely pick since a verify is about to follow
+    return await _ign(inter, user_input, speculate=True)
+
+
+async def _ign(
+    inter: disnake.AppCmdInter, user_input: str, speculate: bool
 ) -> list[disnake.OptionChoice]:
     log_autocomplete(inter, user_input, "ign")
     user_input = user_input.lower().strip()
@@ -18,16 +272,20 @@ async def ign(
         return [
             disnake.OptionChoice(name=ign, value=ign) for ign in constants.ADMIN_IGNS
         ]
-    try:
-        players = await asyncio.wait_for(
-            ragingenbyapi.search_ign_stem(user_input), timeout=5
+    local = local_choices(user_input)
+    players = ragingenbyapi.get_cached_ign_stem(user_input)
+    if players is None and len(local) < 25:
+        players = await remote_players(
+            inter, "ign", user_input, remaining_budget(inter)
         )
-    except asyncio.TimeoutError:
-        players = []
-    return (
+    choices = merge_choices(
+        local,
         [
             disnake.OptionChoice(name=player.name, value=player.uuid)
-            for player in players
-        ]
-        + [disnake.OptionChoice(name=user_input, value=user_input)]
-    )[:25]
+            for player in players or []
+        ],
+        [disnake.OptionChoice(name=user_input, value=user_input)],
+    )
+    if speculate:
+        prefetch(choices, user_input)
+    return choices
@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+import asyncio
+import datetime
+import sys
+import time
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+def estimate_size(value: Any) -> int:
+    # rough deep sizeof for json-like data, good enough for a memory budget
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class _Entry(Generic[V]):
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: V, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+class TTLCache(Generic[K, V]):
+    def __init__(
+        self,
+        ttl: datetime.timedelta,
+        max_entries: int,
+        max_bytes: int | None = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: OrderedDict[K, _Entry[V]] = OrderedDict()
+        self._next_prune = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return self.peek(key) is not None
+
+    def peek(self, key: K) -> V | None:
+        # like get, but leaves the hit/miss counters and lru order alone
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        return entry.value
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(
+        self,
+        key: K,
+        value: V,
+        ttl: datetime.timedelta | None = None,
+        size: int | None = None,
+    ):
+        if key in self._entries:
+            self._remove(key)
+        size = estimate_size(value) if size is None else size
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (ttl or self.ttl).total_seconds()
+        self._entries[key] = _Entry(value, expires_at, size)
+        self.bytes += size
+        self._enforce_limits()
+
+    def pop(self, key: K) -> V | None:
+        entry = self._remove(key)
+        return entry.value if entry else None
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def prune(self) -> int:
+        now = time.monotonic()
+        expired = [
+            key for key, entry in self._entries.items() if entry.expires_at <= now
+        ]
+        for key in expired:
+            self._remove(key)
+        return len(expired)
+
+    def _remove(self, key: K) -> _Entry[V] | None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        return entry
+
+    def _over_limit(self) -> bool:
+        return len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        )
+
+    def _enforce_limits(self):
+        if not self._over_limit():
+            return
+        # drop dead entries first so we don't evict live ones needlessly
+        now = time.monotonic()
+        if now >= self._next_prune:
+            self.prune()
+            self._next_prune = now + max(self.ttl.total_seconds() / 10, 1)
+        while self._over_limit():
+            self._remove(next(iter(self._entries)))
+
+
+class SingleFlight(Generic[K, V]):
+    def __init__(self):
+        self.started = 0
+        self.coalesced = 0
+        self._inflight: dict[K, asyncio.Task[V]] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._inflight
+
+    async def run(self, key: K, func: Callable[[], Awaitable[V]]) -> V:
+        task = self._inflight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+        # shield so one caller getting cancelled doesn't cancel it for every other waiter
+        return await asyncio.shield(task)
+
+    def _done(self, key: K, task: asyncio.Task[V]):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # mark the exception as retrieved, every waiter already got it re-raised
+        if not task.cancelled():
+            task.exception()
@@ -1,7 +1,10 @@
-from typing import Any
+from typing import Any, Mapping
+import asyncio
 import datetime
+import math
+import time
 
-from modules import asyncreqs, mojang
+from modules import asyncreqs, cache, mojang
 import constants
 
 
@@ -55,13 +58,116 @@ class PlayerRateLimitError(RateLimitError):
         )
 
 
+class RateLimitGovernor:
+    # hypixel's headers are per key, so a single governor covers every endpoint
+    cause_message: str = "Local API key budget exhausted"
+
+    def __init__(self, reserve: int = 0):
+        # requests waiting for budget leave `reserve` requests for fail-fast callers
+        self.reserve = reserve
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at = 0.0
+        self.pending = 0
+        self.waited = 0
+        self.rejected = 0
+        self._queue = asyncio.Lock()
+
+    @property
+    def retry_after(self) -> float:
+        return max(self.reset_at - time.monotonic(), 0.0)
+
+    def available(self) -> int | None:
+        if self.remaining is not None and time.monotonic() >= self.reset_at:
+            # new window, assume the full limit until the next response says otherwise
+            self.remaining = self.limit
+        if self.remaining is None:
+            return None
+        return self.remaining - self.pending
+
+    def _try_acquire(self, reserve: int) -> bool:
+        available = self.available()
+        if available is not None and available <= reserve:
+            return False
+        self.pending += 1
+        return True
+
+    async def acquire(self, wait: bool = False):
+        if not wait:
+            if self._try_acquire(0):
+                return
+            self.rejected += 1
+            raise RateLimitError(
+                cause=self.cause_message,
+                status_code=429,
+                retry_after=math.ceil(self.retry_after),
+            )
+        # waiters queue on the lock so they get released in order as budget frees up
+        async with self._queue:
+            while not self._try_acquire(self.reserve):
+                self.waited += 1
+                await asyncio.sleep(max(self.retry_after, 0.5))
+
+    def release(self, headers: Mapping[str, str] | None = None):
+        self.pending = max(self.pending - 1, 0)
+        if headers is not None:
+            self.update(headers)
+
+    def update(self, headers: Mapping[str, str]):
+        remaining = headers.get("RateLimit-Remaining")
+        reset = headers.get("RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        limit = headers.get("RateLimit-Limit")
+        if limit is not None:
+            self.limit = int(limit)
+        reset_at = time.monotonic() + int(reset)
+        # responses can land out of order, within a window the lowest remaining is newest
+        if self.remaining is not None and abs(reset_at - self.reset_at) < 2:
+            self.remaining = min(self.remaining, int(remaining))
+        else:
+            self.remaining = int(remaining)
+        self.reset_at = reset_at
+
+    def block(self, retry_after: int):
+        self.remaining = 0
+        self.reset_at = time.monotonic() + retry_after
+
+
+_GOVERNOR = RateLimitGovernor(reserve=10)
+
+
 _CACHE_TTL = datetime.timedelta(seconds=60)
-_CACHE: dict[tuple[str, str], tuple[datetime.datetime, dict[str, Any]]] = {}
+_CACHE_TTLS: dict[str, datetime.timedelta] = {
+    "/player": datetime.timedelta(seconds=60),
+}
+_CACHE: cache.TTLCache[tuple[str, str], dict[str, Any]] = cache.TTLCache(
+    ttl=_CACHE_TTL,
+    max_entries=2_000,
+    max_bytes=64 * 1024 * 1024,
+)
 
 
-async def get(endpoint: str, **params: Any) -> dict[str, Any]:
+_INFLIGHT: cache.SingleFlight[tuple[str, str], dict[str, Any]] = cache.SingleFlight()
+
+
+def stats() -> dict[str, int | None]:
+    return {
+        "cache_hits": _CACHE.hits,
+        "cache_misses": _CACHE.misses,
+        "cache_entries": len(_CACHE),
+        "cache_bytes": _CACHE.bytes,
+        "requests": _INFLIGHT.started,
+        "coalesced": _INFLIGHT.coalesced,
+        "rate_limit_remaining": _GOVERNOR.available(),
+        "rate_limit_waited": _GOVERNOR.waited,
+        "rate_limit_rejected": _GOVERNOR.rejected,
+    }
+
+
+async def get(endpoint: str, wait: bool = False, **params: Any) -> dict[str, Any]:
     # formulate request
-    url = "https://api.hypixel.net/v2" + endpoint
+    url = constants.HYPIXEL_API_URL + endpoint
     ign = params.pop("ign", None)
     if ign and isinstance(ign, str):
         player = await mojang.get_player(ign)
@@ -71,22 +177,46 @@ async def get(endpoint: str, **params: Any) -> dict[str, Any]:
     cache_key: tuple[str, str] | None = (
         (endpoint, uuid) if isinstance(uuid, str) else None
     )
-    cached_data: dict[str, Any] | None = None
-    if cache_key:
-        cached: tuple[datetime.datetime, dict[str, Any]] | None = _CACHE.get(cache_key)
-        if cached and datetime.datetime.now() - cached[0] <= _CACHE_TTL:
-            cached_data = cached[1]
+    if cache_key is None:
+        await _GOVERNOR.acquire(wait=wait)
+        return await _fetch(url, endpoint, params, cache_key)
+    cached_data = _CACHE.get(cache_key)
+    if cached_data is not None:
+        return cached_data
+    # only requests that already hold budget are shared, so a fail-fast caller never ends
+    # up parked behind a background request that is still waiting for the rate limit
+    if cache_key not in _INFLIGHT:
+        await _GOVERNOR.acquire(wait=wait)
+        # someone else may have fetched it, or started to, while we waited for budget.
+        # peek so this recheck doesn't count as a second miss
+        cached_data = _CACHE.peek(cache_key)
+        if cached_data is not None or cache_key in _INFLIGHT:
+            _GOVERNOR.release()
+        if cached_data is not None:
             return cached_data
+    return await _INFLIGHT.run(
+        cache_key, lambda: _fetch(url, endpoint, params, cache_key)
+    )
 
-    # get data
-    response = await asyncreqs.get(url, params=params)
+
+async def _fetch(
+    url: str,
+    endpoint: str,
+    params: dict[str, Any],
+    cache_key: tuple[str, str] | None,
+) -> dict[str, Any]:
+    # get data, the caller has already acquired budget from the governor
+    headers: Mapping[str, str] | None = None
+    try:
+        response = await asyncreqs.get(url, params=params)
+        headers = response.headers
+    finally:
+        _GOVERNOR.release(headers)
     data = response.json()
 
     # handle errors
     error = data.get("cause")
     if data.get("cause") == PlayerRateLimitError.cause_message:
-        if cached_data:
-            return cached_data
         raise PlayerRateLimitError(
             cause=error,
             status_code=response.status_code,
@@ -94,18 +224,24 @@ async def get(endpoint: str, **params: Any) -> dict[str, Any]:
             player=params.get("uuid"),
         )
     if response.status_code == 429:
-        if cached_data:
-            return cached_data
+        retry_after = int(response.headers.get("Retry-After", "0"))
+        _GOVERNOR.block(retry_after)
         raise RateLimitError(
             cause=data["cause"],
             status_code=response.status_code,
-            retry_after=int(response.headers.get("Retry-After", "0")),
+            retry_after=retry_after,
         )
     if error:
         raise APIError(cause=data["cause"], status_code=response.status_code)
 
     if cache_key:
-        _CACHE[cache_key] = (datetime.datetime.now(), data)
+        _CACHE.set(
+            cache_key,
+            data,
+            ttl=_CACHE_TTLS.get(endpoint, _CACHE_TTL),
+            # the raw body is a decent approximation of the parsed json's footprint
+            size=len(response.content) * 4,
+        )
     return data
 
 
@@ -146,7 +282,7 @@ class PlayerData:
         return self.player.get("rank")
 
 
-async def get_player(player: str | mojang.Player) -> PlayerData:
+async def get_player(player: str | mojang.Player, wait: bool = False) -> PlayerData:
     player = await mojang.get_player(player) if isinstance(player, str) else player
-    data = await get("/player", uuid=player.uuid)
+    data = await get("/player", wait=wait, uuid=player.uuid)
     return PlayerData(data, mojang_player=player)
@@ -1,8 +1,10 @@
 import re
 import asyncio
+import datetime
+import functools
 import json
 
-from modules import asyncreqs
+from modules import asyncreqs, cache
 import constants
 
 
@@ -50,38 +52,175 @@ class PlayerNotFound(MojangAPIError):
         super().__init__(f"Player not found: {identifier}", 404)
 
 
-async def get_player(identifier: str, attempts: int = 0) -> Player:
+# names can only change every 30 days, so a few hours of staleness is harmless
+_CACHE_TTL = datetime.timedelta(hours=6)
+_NOT_FOUND_TTL = datetime.timedelta(minutes=5)
+_CACHE_MAX_ENTRIES = 20_000
+_BY_UUID: cache.TTLCache[str, Player] = cache.TTLCache(
+    ttl=_CACHE_TTL, max_entries=_CACHE_MAX_ENTRIES
+)
+_BY_NAME: cache.TTLCache[str, Player] = cache.TTLCache(
+    ttl=_CACHE_TTL, max_entries=_CACHE_MAX_ENTRIES
+)
+_NOT_FOUND: cache.TTLCache[str, bool] = cache.TTLCache(
+    ttl=_NOT_FOUND_TTL, max_entries=_CACHE_MAX_ENTRIES // 4
+)
+_INFLIGHT: cache.SingleFlight[str, Player] = cache.SingleFlight()
+# mojang's bulk endpoint caps out at 10 names and only accepts names, not uuids
+# the mirror occasionally answers with a broken body, those are worth a couple more tries
+_DECODE_ATTEMPTS = 4
+_DECODE_RETRY_DELAY = 0.5
+_BULK_BATCH_SIZE = 10
+_BULK_CONCURRENCY = 8
+
+
+def stats() -> dict[str, int]:
+    return {
+        "uuid_hits": _BY_UUID.hits,
+        "name_hits": _BY_NAME.hits,
+        "not_found_hits": _NOT_FOUND.hits,
+        "cached_players": len(_BY_UUID),
+        "requests": _INFLIGHT.started,
+        "coalesced": _INFLIGHT.coalesced,
+    }
+
+
+def remember(player: Player):
+    previous = _BY_UUID.get(player.uuid)
+    if previous is not None and previous.name.lower() != player.name.lower():
+        # the player changed their name, the old one may now belong to someone else
+        _BY_NAME.pop(previous.name.lower())
+    _BY_UUID.set(player.uuid, player, size=0)
+    _BY_NAME.set(player.name.lower(), player, size=0)
+    _NOT_FOUND.pop(player.uuid)
+    _NOT_FOUND.pop(player.name.lower())
+
+
+def get_cached_player(identifier: str) -> Player | None:
+    identifier = identifier.lower().replace("-", "")
+    if is_uuid(identifier):
+        return _BY_UUID.get(identifier)
+    return _BY_NAME.get(identifier)
+
+
+async def get_player(identifier: str) -> Player:
     identifier = identifier.lower().replace("-", "")
     if not is_identifier(identifier):
         raise PlayerNotFound(identifier)
-
-    response = await asyncreqs.get(constants.MOJANG_API_URL.format(identifier))
-    if response.status_code == 404:
+    player = get_cached_player(identifier)
+    if player is not None:
+        return player
+    if _NOT_FOUND.get(identifier):
         raise PlayerNotFound(identifier)
-    try:
-        data = response.json()
-    except json.JSONDecodeError:
-        print(
-            "invalid mojang response for",
-            identifier,
-            response.status_code,
-            response.text,
-        )
-        if attempts > 3:
+    return await _INFLIGHT.run(identifier, lambda: _fetch_player(identifier))
+
+
+async def _fetch_player(identifier: str) -> Player:
+    # 5xx, 429, timeouts and connection errors are retried by asyncreqs' policy for this
+    # host, undecodable bodies are retried here
+    for attempt in range(_DECODE_ATTEMPTS):
+        response = await asyncreqs.get(constants.MOJANG_API_URL.format(identifier))
+        if response.status_code == 404:
+            _NOT_FOUND.set(identifier, True, size=0)
             raise PlayerNotFound(identifier)
-        await asyncio.sleep(0.5)
-        return await get_player(identifier, attempts + 1)
+        try:
+            data = response.json()
+            break
+        except json.JSONDecodeError as e:
+            print(
+                "invalid mojang response for",
+                identifier,
+                response.status_code,
+                response.text,
+            )
+            if attempt == _DECODE_ATTEMPTS - 1:
+                raise PlayerNotFound(identifier) from e
+            await asyncio.sleep(_DECODE_RETRY_DELAY)
+    else:
+        raise AssertionError("unreachable")
     error = data.get("errorMessage")
     if error:
         raise MojangAPIError(error, response.status_code)
-    return Player.from_dict(data)
+    player = Player.from_dict(data)
+    remember(player)
+    return player
+
+
+async def _fetch_names(names: list[str]) -> dict[str, Player]:
+    response = await asyncreqs.post(constants.MOJANG_BULK_API_URL, json=names)
+    if response.status_code != 200:
+        raise MojangAPIError(response.text, response.status_code)
+    found: dict[str, Player] = {}
+    for data in response.json():
+        player = Player.from_dict(data)
+        remember(player)
+        found[player.name.lower()] = player
+    return found
+
+
+async def _resolve_names(names: list[str], results: dict[str, Player | Exception]):
+    try:
+        found = await _fetch_names(names)
+    except Exception as e:
+        print(f"Bulk mojang lookup failed, falling back to single lookups: {e}")
+        for name in names:
+            await _resolve_one(name, results)
+        return
+    for name in names:
+        if name in found:
+            results[name] = found[name]
+        else:
+            _NOT_FOUND.set(name, True, size=0)
+            results[name] = PlayerNotFound(name)
+
+
+async def _resolve_one(identifier: str, results: dict[str, Player | Exception]):
+    try:
+        results[identifier] = await get_player(identifier)
+    except Exception as e:
+        results[identifier] = e
+
+
+async def get_players(*identifiers: str) -> list[Player | Exception]:
+    """Resolve many names/uuids at once.
+
+    Returns one entry per identifier, in input order. An identifier that can't be
+    resolved gets its exception (e.g. PlayerNotFound, MojangAPIError) in its slot
+    instead of raising, so one bad name doesn't fail the whole batch. Callers must
+    check each entry with isinstance(entry, Player).
+    """
+    normalized = [identifier.lower().replace("-", "") for identifier in identifiers]
+    results: dict[str, Player | Exception] = {}
+    names: list[str] = []
+    uuids: list[str] = []
+    for identifier in dict.fromkeys(normalized):
+        player = get_cached_player(identifier)
+        if player is not None:
+            results[identifier] = player
+        elif not is_identifier(identifier) or _NOT_FOUND.get(identifier):
+            results[identifier] = PlayerNotFound(identifier)
+        elif is_uuid(identifier):
+            uuids.append(identifier)
+        else:
+            names.append(identifier)
+
+    jobs = iter(
+        [
+            functools.partial(_resolve_names, names[i : i + _BULK_BATCH_SIZE], results)
+            for i in range(0, len(names), _BULK_BATCH_SIZE)
+        ]
+        + [functools.partial(_resolve_one, uuid, results) for uuid in uuids]
+    )
 
+    # a fixed worker pool caps in-flight requests no matter how many identifiers we get
+    async def worker():
+        for job in jobs:
+            await job()
 
-async def get_players(*identifiers: str) -> list[Player]:
-    identifiers_set = set(identifiers)
-    return await asyncio.gather(
-        *[get_player(identifier) for identifier in identifiers_set]
+    await asyncio.gather(
+        *[worker() for _ in range(min(_BULK_CONCURRENCY, len(names) + len(uuids)))]
     )
+    return [results[identifier] for identifier in normalized]
 
 
 def is_uuid(uuid: str) -> bool:
@@ -1,12 +1,139 @@
-from typing import Any, Awaitable, cast
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, cast
 import inspect
+import time
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
-from pymongo import UpdateOne
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import OperationFailure
 from pymongo.results import BulkWriteResult, InsertOneResult, DeleteResult, UpdateResult
 
 import constants
 
 
+_clients: dict[str, AsyncIOMotorClient] = {}
+
+# every index the bot's queries rely on, keyed by collection name. ensure_indexes() creates
+# whatever is missing at startup
+INDEXES: dict[str, list[IndexModel]] = {
+    constants.LINKED_COLLECTION_NAME: [
+        # search_verification(uuid=...), one discord account per minecraft account
+        IndexModel([("uuid", ASCENDING)], name="uuid", unique=True),
+    ],
+    constants.BAN_COLLECTION_NAME: [
+        # search_ban: active bans for a user, newest first
+        IndexModel(
+            [("discordId", ASCENDING), ("unban", ASCENDING), ("date", DESCENDING)],
+            name="discordId_unban_date",
+        ),
+        # /moderation history pages by (date, _id) for a discord user or a minecraft uuid
+        IndexModel(
+            [("discordId", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+            name="discordId_date_id",
+        ),
+        IndexModel(
+            [("uuid", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+            name="uuid_date_id",
+        ),
+    ],
+}
+# index builds slower than this get logged
+SLOW_INDEX_BUILD = 1.0
+# index usage counters younger than this (fresh index or server restart) say nothing yet
+INDEX_USAGE_MIN_AGE = timedelta(days=1)
+# databases whose indexes were already ensured by this process, on_ready fires on every
+# gateway reconnect
+_ensured: set[str] = set()
+
+
+def get_client(uri: str | None = None) -> AsyncIOMotorClient:
+    uri = uri or constants.MONGODB_URI
+    client = _clients.get(uri)
+    if client is None:
+        client = AsyncIOMotorClient(
+            uri,
+            maxPoolSize=constants.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=constants.MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=constants.MONGODB_MAX_IDLE_TIME_MS,
+        )
+        _clients[uri] = client
+    return client
+
+
+async def close():
+    # pop before closing so a second close() call is a no-op
+    while _clients:
+        _, client = _clients.popitem()
+        result = client.close()
+        if inspect.isawaitable(result):
+            await cast(Awaitable[None], result)
+
+
+async def ensure_indexes(db: str | None = None):
+    db = db or constants.DB_NAME
+    if db in _ensured:
+        return
+    _ensured.add(db)
+    try:
+        await _ensure_indexes(db)
+    except Exception:
+        # let the next on_ready try again
+        _ensured.discard(db)
+        raise
+
+
+async def _ensure_indexes(db: str):
+    database = get_client()[db]
+    for collection_name, indexes in INDEXES.items():
+        collection = database[collection_name]
+        existing = await collection.index_information()
+        for index in indexes:
+            name = index.document["name"]
+            if name in existing:
+                continue
+            start = time.perf_counter()
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                # most likely duplicate data blocking a unique index, needs a manual cleanup
+                print(f"[mongodb] Failed to create index {collection_name}.{name}: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            print(f"[mongodb] Created index {collection_name}.{name} in {elapsed:.2f}s")
+            if elapsed > SLOW_INDEX_BUILD:
+                print(f"[mongodb] Slow index build: {collection_name}.{name}")
+        await log_index_usage(collection)
+
+
+async def log_index_usage(collection: AsyncIOMotorCollection):
+    # $indexStats counts resets on server restart, so "unused" means since then
+    declared = {index.document["name"] for index in INDEXES.get(collection.name, [])}
+    try:
+        stats = await collection.aggregate([{"$indexStats": {}}]).to_list(length=None)
+    except OperationFailure as e:
+        print(f"[mongodb] Can't read index stats for {collection.name}: {e}")
+        return
+    for stat in stats:
+        name = stat["name"]
+        if name == "_id_":
+            continue
+        ops = stat.get("accesses", {}).get("ops", 0)
+        if name not in declared:
+            print(
+                f"[mongodb] Undeclared index {collection.name}.{name} ({ops} ops), "
+                "consider dropping it"
+            )
+        elif not ops:
+            since = stat.get("accesses", {}).get("since")
+            if since is None:
+                continue
+            # pymongo hands back naive datetimes in utc unless the client is tz_aware
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            if datetime.now(timezone.utc) - since < INDEX_USAGE_MIN_AGE:
+                continue
+            print(f"[mongodb] Unused index {collection.name}.{name} since {since}")
+
+
 class Collection:
     def __init__(self, collection: str, db: str | None = None):
         self.db_name = db or constants.DB_NAME
@@ -16,7 +143,7 @@ class Collection:
 
     async def get_client(self) -> AsyncIOMotorClient:
         if self._client is None:
-            self._client = AsyncIOMotorClient(constants.MONGODB_URI)
+            self._client = get_client()
         return self._client
 
     async def get_collection(self) -> AsyncIOMotorCollection:
@@ -26,12 +153,9 @@ class Collection:
         return self._collection
 
     async def close(self):
-        if self._client is not None:
-            result = self._client.close()
-            if inspect.isawaitable(result):
-                await cast(Awaitable[None], result)
-            self._client = None
-            self._collection = None
+        # the client is shared, so only drop our references. mongodb.close() shuts it down
+        self._client = None
+        self._collection = None
 
     async def update(
         self,
@@ -79,6 +203,26 @@ class Collection:
             cursor = cursor.limit(limit)
         return await cursor.to_list(length=limit)
 
+    async def iterate(
+        self,
+        query: dict[str, Any],
+        projection: dict[str, Any] | None = None,
+        sort: dict[str, int] | None = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[dict[str, Any]]:
+        collection = await self.get_collection()
+        cursor = collection.find(query, projection=projection, batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        async for document in cursor:
+            yield document
+
+    async def bulk_write(
+        self, operations: list[Any], ordered: bool = True
+    ) -> BulkWriteResult:
+        collection = await self.get_collection()
+        return await collection.bulk_write(operations, ordered=ordered)
+
     async def delete_one(self, query: dict[str, Any]) -> DeleteResult:
         collection = await self.get_collection()
         return await collection.delete_one(query)
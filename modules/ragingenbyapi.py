@@ -1,18 +1,130 @@
+from collections import OrderedDict
+import datetime
+import time
+
 from modules import asyncreqs, mojang
 import constants
 
-stem_cache: dict[str, list[mojang.Player]] = {}
 
+class _TrieNode:
+    __slots__ = ("children", "parent", "char", "results", "complete", "expires_at")
 
-async def search_ign_stem(stem: str) -> list[mojang.Player]:
+    def __init__(self, parent: "_TrieNode | None", char: str):
+        self.children: dict[str, _TrieNode] = {}
+        self.parent = parent
+        self.char = char
+        self.results: list[mojang.Player] | None = None
+        self.complete = False
+        self.expires_at = 0.0
+
+
+class StemTrie:
+    def __init__(self, ttl: datetime.timedelta, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+        # largest response seen so far, a cross-check on constants.IGN_STEM_LIMIT
+        self.largest_result = 0
+        self._root = _TrieNode(None, "")
+        # stems that currently hold results, oldest first, for lru eviction
+        self._entries: OrderedDict[str, _TrieNode] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, stem: str) -> list[mojang.Player] | None:
+        now = time.monotonic()
+        node: _TrieNode | None = self._root
+        complete_prefix: tuple[str, _TrieNode] | None = None
+        for depth, char in enumerate(stem, start=1):
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.results is None:
+                continue
+            prefix = stem[:depth]
+            if node.expires_at <= now:
+                self._clear(prefix)
+                continue
+            if depth == len(stem):
+                self.hits += 1
+                self._entries.move_to_end(prefix)
+                return list(node.results)
+            if node.complete:
+                complete_prefix = (prefix, node)
+        if complete_prefix is None:
+            self.misses += 1
+            return None
+        # a complete shorter prefix already holds every player that matches this stem
+        prefix, node = complete_prefix
+        self.prefix_hits += 1
+        self._entries.move_to_end(prefix)
+        return [
+            player
+            for player in node.results or []
+            if player.name.lower().startswith(stem)
+        ]
+
+    def is_complete(self, players: list[mojang.Player]) -> bool:
+        # a short response is the complete set only if it's short of the api's cap. until a
+        # capped response has been seen, a count equal to the largest so far could be the cap
+        if len(players) > self.largest_result:
+            self.largest_result = len(players)
+            if self.largest_result > constants.IGN_STEM_LIMIT:
+                print(
+                    f"[ragingenbyapi] Stem api returned {self.largest_result} players, "
+                    f"IGN_STEM_LIMIT ({constants.IGN_STEM_LIMIT}) is too low"
+                )
+        return len(players) < min(constants.IGN_STEM_LIMIT, self.largest_result)
+
+    def set(self, stem: str, players: list[mojang.Player], complete: bool):
+        node = self._root
+        for char in stem:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _TrieNode(node, char)
+            node = child
+        node.results = players
+        node.complete = complete
+        node.expires_at = time.monotonic() + self.ttl.total_seconds()
+        self._entries[stem] = node
+        self._entries.move_to_end(stem)
+        while len(self._entries) > self.max_entries:
+            self._clear(next(iter(self._entries)))
+
+    def _clear(self, stem: str):
+        node = self._entries.pop(stem, None)
+        if node is None:
+            return
+        node.results = None
+        node.complete = False
+        # drop now-empty branches so evicted stems actually free their nodes
+        while node.parent is not None and not node.children and node.results is None:
+            del node.parent.children[node.char]
+            node = node.parent
+
+
+stem_cache = StemTrie(ttl=datetime.timedelta(hours=1), max_entries=5_000)
+
+
+def get_cached_ign_stem(stem: str) -> list[mojang.Player] | None:
     stem = stem.lower().strip()
     if not stem:
         return []
-    if stem in stem_cache:
-        return stem_cache[stem].copy()
+    return stem_cache.get(stem)
+
+
+async def search_ign_stem(stem: str) -> list[mojang.Player]:
+    stem = stem.lower().strip()
+    cached = get_cached_ign_stem(stem)
+    if cached is not None:
+        return cached
     response = await asyncreqs.get(constants.IGN_STEM_URL.format(stem))
     if response.status_code != 200:
         print(f"Failed to search for ign stem {stem}: {response.status_code}")
         return []
-    stem_cache[stem] = [mojang.Player.from_dict(player) for player in response.json()]
-    return stem_cache[stem]
+    players = [mojang.Player.from_dict(player) for player in response.json()]
+    stem_cache.set(stem, players, complete=stem_cache.is_complete(players))
+    return players.copy()
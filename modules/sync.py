@@ -0,0 +1,231 @@
+from typing import Awaitable, Callable, Literal
+import asyncio
+import datetime
+import itertools
+import time
+
+# checked: fetched upstream, nothing to write. changed: wrote to discord. skipped: fresh
+SyncResult = Literal["checked", "changed", "skipped"]
+
+
+# queue priorities, lower runs first
+_URGENT, _INTAKE, _BACKGROUND = 0, 1, 2
+
+
+class _Job:
+    __slots__ = ("member_id", "urgent", "future", "claimed", "queued_at")
+
+    def __init__(
+        self, member_id: int, urgent: bool, future: asyncio.Future[SyncResult | None]
+    ):
+        self.member_id = member_id
+        self.urgent = urgent
+        self.future = future
+        self.claimed = False
+        self.queued_at = time.monotonic()
+
+
+class SyncEngine:
+    def __init__(
+        self,
+        handler: Callable[[int, bool], Awaitable[SyncResult | None]],
+        workers: int = 4,
+        urgent_workers: int = 1,
+        intake_size: int = 500,
+    ):
+        # handler(member_id, urgent) does the actual work for one member
+        self.handler = handler
+        self.workers = workers
+        self.urgent_workers = urgent_workers
+        self.intake_size = intake_size
+        self.intake_dropped = 0
+        self.sweep_total = 0
+        self.sweep_done = 0
+        self.sweep_errors = 0
+        self.sweep_results: dict[SyncResult, int] = {}
+        self.sweep_started = 0.0
+        self._seq = itertools.count()
+        self._queue: asyncio.PriorityQueue[tuple[int, int, _Job]] = (
+            asyncio.PriorityQueue()
+        )
+        # urgent jobs also go here so a dedicated worker can grab them even while every
+        # regular worker is stuck waiting on rate limit budget
+        self._urgent: asyncio.Queue[_Job] = asyncio.Queue()
+        self._pending: dict[int, _Job] = {}
+        # joins waiting to be picked up, oldest first
+        self._intake: dict[int, _Job] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    @property
+    def intake_depth(self) -> int:
+        return len(self._intake)
+
+    @property
+    def intake_oldest(self) -> float:
+        # seconds the oldest waiting join has been queued for
+        if not self._intake:
+            return 0.0
+        return time.monotonic() - next(iter(self._intake.values())).queued_at
+
+    def start(self):
+        if self.running:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(self._next_job))
+            for _ in range(self.workers)
+        ] + [
+            asyncio.create_task(self._worker(self._urgent.get))
+            for _ in range(self.urgent_workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._pending.values():
+            job.future.cancel()
+        self._pending.clear()
+        self._intake.clear()
+        self._queue = asyncio.PriorityQueue()
+        self._urgent = asyncio.Queue()
+
+    def enqueue(
+        self, member_id: int, urgent: bool = False
+    ) -> asyncio.Future[SyncResult | None]:
+        existing = self._pending.get(member_id)
+        if existing is not None and (existing.urgent or not urgent):
+            return existing.future
+        if existing is not None:
+            # bump it to the front, the old background entry gets skipped when reached
+            existing.claimed = True
+            self._drop_intake(existing)
+            future = existing.future
+        else:
+            future = asyncio.get_running_loop().create_future()
+            # mark errors as retrieved, nobody awaits background jobs individually
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        job = _Job(member_id, urgent, future)
+        self._pending[member_id] = job
+        self._queue.put_nowait(
+            (_URGENT if urgent else _BACKGROUND, next(self._seq), job)
+        )
+        if urgent:
+            self._urgent.put_nowait(job)
+        return future
+
+    def admit(self, member_id: int) -> asyncio.Future[SyncResult | None] | None:
+        # bounded intake for joins, ahead of sweeps but behind explicit /update requests.
+        # returns None when the intake is full, the next sweep catches those members
+        existing = self._pending.get(member_id)
+        if existing is not None and (existing.urgent or member_id in self._intake):
+            return existing.future
+        if len(self._intake) >= self.intake_size:
+            if existing is not None:
+                # still queued behind the sweep, better late than dropped
+                return existing.future
+            self.intake_dropped += 1
+            if self.intake_dropped % 100 == 1:
+                print(
+                    f"[SyncEngine] Join intake full, dropped {self.intake_dropped} so far"
+                )
+            return None
+        if existing is not None:
+            # queued by a running sweep, move it up to intake priority. the old
+            # background entry gets skipped when reached
+            existing.claimed = True
+            future = existing.future
+        else:
+            future = asyncio.get_running_loop().create_future()
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        job = _Job(member_id, False, future)
+        self._pending[member_id] = job
+        self._intake[member_id] = job
+        self._queue.put_nowait((_INTAKE, next(self._seq), job))
+        return future
+
+    def discard(self, member_id: int):
+        # drop a job that hasn't started yet, e.g. the member left before we got to them.
+        # urgent jobs stay, someone is awaiting them and the handler copes with the
+        # member being gone
+        job = self._pending.get(member_id)
+        if job is None or job.urgent:
+            return
+        del self._pending[member_id]
+        job.claimed = True
+        self._drop_intake(job)
+        job.future.cancel()
+
+    def _drop_intake(self, job: _Job):
+        if self._intake.get(job.member_id) is job:
+            del self._intake[job.member_id]
+
+    async def sweep(self, member_ids: list[int]):
+        self.sweep_total = len(member_ids)
+        self.sweep_done = 0
+        self.sweep_errors = 0
+        self.sweep_results = {"checked": 0, "changed": 0, "skipped": 0}
+        self.sweep_started = time.monotonic()
+        futures = [self.enqueue(member_id) for member_id in member_ids]
+        for future in futures:
+            future.add_done_callback(self._count)
+        await asyncio.gather(*futures, return_exceptions=True)
+        print(f"[SyncEngine] Sweep finished: {self.progress()}")
+
+    def eta(self) -> datetime.timedelta | None:
+        if not self.sweep_done:
+            return None
+        elapsed = time.monotonic() - self.sweep_started
+        remaining = self.sweep_total - self.sweep_done
+        return datetime.timedelta(seconds=elapsed / self.sweep_done * remaining)
+
+    def progress(self) -> str:
+        eta = self.eta()
+        eta_text = str(eta).split(".")[0] if eta is not None else "unknown"
+        results = " / ".join(f"{n} {key}" for key, n in self.sweep_results.items())
+        return (
+            f"{self.sweep_done}/{self.sweep_total} members ({results}), "
+            f"{self.sweep_errors} errors, {self.queued} queued, eta {eta_text}, "
+            f"{self.intake_depth} joins waiting (oldest {self.intake_oldest:.0f}s)"
+        )
+
+    async def _next_job(self) -> _Job:
+        return (await self._queue.get())[2]
+
+    async def _worker(self, next_job: Callable[[], Awaitable[_Job]]):
+        while True:
+            job = await next_job()
+            if job.claimed:
+                continue
+            job.claimed = True
+            if self._pending.get(job.member_id) is job:
+                del self._pending[job.member_id]
+            self._drop_intake(job)
+            try:
+                result = await self.handler(job.member_id, job.urgent)
+            except Exception as e:
+                print(f"[SyncEngine] Error syncing member {job.member_id}: {e}")
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def _count(self, future: asyncio.Future[SyncResult | None]):
+        self.sweep_done += 1
+        if future.cancelled():
+            pass
+        elif future.exception() is not None:
+            self.sweep_errors += 1
+        elif (result := future.result()) is not None:
+            self.sweep_results[result] = self.sweep_results.get(result, 0) + 1
+        if self.sweep_done % 250 == 0:
+            print(f"[SyncEngine] {self.progress()}")
@@ -0,0 +1,37 @@
+import asyncio
+import types
+import unittest
+
+from benchmarks.fakeapi import FakeAPI
+from modules import asyncreqs, autocomplete, ragingenbyapi
+
+
+class RemotePlayersTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeAPI(players=5_000, latency=0.3, jitter=0)
+        await self.server.start()
+        self.server.patch_constants()
+        ragingenbyapi.stem_cache = ragingenbyapi.StemTrie(
+            ttl=ragingenbyapi.stem_cache.ttl, max_entries=100
+        )
+        self.inter = types.SimpleNamespace(author=types.SimpleNamespace(id=1))
+
+    async def asyncTearDown(self):
+        await asyncreqs.close()
+        await self.server.close()
+
+    async def test_capped_prefix_does_not_hide_longer_match(self):
+        # "p" matches every fake player, so its lookup comes back capped
+        short = asyncio.create_task(
+            autocomplete.remote_players(self.inter, "ign", "p", timeout=2)
+        )
+        await asyncio.sleep(0.05)
+        players = await autocomplete.remote_players(
+            self.inter, "ign", "player4321", timeout=2
+        )
+        await short
+        self.assertIn("Player4321", [player.name for player in players])
+
+
+if __name__ == "__main__":
+    unittest.main()